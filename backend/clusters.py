@@ -0,0 +1,189 @@
+"""
+Viewport clustering for GET /api/entrances/clusters.
+At load time every entrance is projected to Web Mercator and bucketed into a grid per zoom
+level, CELL_PIXELS map pixels per cell (4 cells across a 256 px tile). Each level keeps,
+per occupied cell, the entrance count, the centroid and the count per agency, sorted by
+cell key (column, then row), so a viewport query binary-searches the key range of each
+column it covers: its cost and its response size depend on the viewport, not on how many
+cells the level has or how many entrances they hold. Cells holding a single entrance, and
+every entrance above MAX_CLUSTER_ZOOM, are returned as plain entrance records; when a
+viewport holds more entrances than the limit, an even spread of them along a Z-order
+curve is returned rather than the first ones in file order.
+"""
+
+import numpy as np
+
+from entrances import _records
+from metrics import stage
+from spatial import mercator
+from store import EntranceStore, get_store, register_derived
+
+# Grid cell size in map pixels at the requested zoom (256 px tiles)
+CELL_PIXELS = 64
+# Zoom levels with a precomputed grid; above this, individual entrances are returned
+MAX_CLUSTER_ZOOM = 16
+# Most clusters (largest first) or entrances returned for one viewport
+MAX_FEATURES = 2000
+# A viewport's column strip of occupied cells is filtered directly up to this many cells (plus
+# 64 per column): ~2 ns per cell, where binary-searching each column costs ~15 us + ~0.1 us per column
+STRIP_SCAN_CELLS = 8192
+
+
+def _cells_per_side(zoom: int) -> int:
+    return (1 << zoom) * (256 // CELL_PIXELS)
+
+
+def _spread_bits(v: np.ndarray) -> np.ndarray:
+    """The low 16 bits of v moved to the even bit positions."""
+    v = v.astype(np.uint32) & 0xFFFF
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    return (v | (v << 1)) & 0x55555555
+
+
+def _z_order(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Z-order (Morton) code of mercator x, y in [0, 1] on a 65536 x 65536 grid: nearby points get nearby codes."""
+    scale = (1 << 16) - 1
+    return _spread_bits(x * scale) | (_spread_bits(y * scale) << 1)
+
+
+class _Level:
+    """The occupied grid cells of one zoom level."""
+
+    def __init__(self, store: EntranceStore, x: np.ndarray, y: np.ndarray, agency_idx: np.ndarray, zoom: int):
+        side = _cells_per_side(zoom)
+        cell_x = np.minimum((x * side).astype(np.int64), side - 1)
+        cell_y = np.minimum((y * side).astype(np.int64), side - 1)
+        keys, first, inverse, counts = np.unique(
+            cell_x * side + cell_y, return_index=True, return_inverse=True, return_counts=True
+        )
+        # Ascending: by column, then row within it
+        self.keys = keys
+        self.side = side
+        self.x = (keys // side).astype(np.int32)
+        self.y = (keys % side).astype(np.int32)
+        self.count = counts.astype(np.int32)
+        self.first_row = first.astype(np.int64)
+        self.lat = np.bincount(inverse, weights=store.lat) / counts
+        self.lon = np.bincount(inverse, weights=store.lon) / counts
+        n_agencies = len(store.agencies)
+        # agencies[c, a]: entrances of agency a in cell c
+        self.agencies = np.bincount(
+            inverse * n_agencies + agency_idx, minlength=len(keys) * n_agencies
+        ).reshape(len(keys), n_agencies).astype(np.int32)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.keys, self.x, self.y, self.count, self.first_row, self.lat, self.lon, self.agencies)
+        return sum(a.nbytes for a in arrays)
+
+    def cells_in(self, x0: int, x1: int, y0: int, y1: int) -> np.ndarray:
+        """Indices (ascending) of the occupied cells in columns x0..x1 and rows y0..y1."""
+        side = self.side
+        x0, x1, y0, y1 = max(x0, 0), min(x1, side - 1), max(y0, 0), min(y1, side - 1)
+        lo, hi = np.searchsorted(self.keys, (x0 * side, (x1 + 1) * side))
+        columns = x1 - x0 + 1
+        if hi - lo <= STRIP_SCAN_CELLS + 64 * columns:
+            return lo + np.flatnonzero((self.y[lo:hi] >= y0) & (self.y[lo:hi] <= y1))
+        starts = np.arange(x0, x1 + 1, dtype=np.int64) * side
+        firsts = np.searchsorted(self.keys, starts + y0)
+        lasts = np.searchsorted(self.keys, starts + y1, side="right")
+        counts = lasts - firsts
+        if not counts.sum():
+            return np.empty(0, dtype=np.int64)
+        # Concatenated ranges firsts[i] .. lasts[i] without a Python loop
+        offsets = np.repeat(firsts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+        return np.arange(counts.sum()) + offsets
+
+
+class ClusterIndex:
+    """One _Level per zoom 0 .. MAX_CLUSTER_ZOOM over a store's entrances."""
+
+    def __init__(self, store: EntranceStore):
+        self.store = store
+        x, y = mercator(store.lat, store.lon)
+        agency_idx = store.agency_of(np.arange(len(store)))
+        self.levels = [_Level(store, x, y, agency_idx, zoom) for zoom in range(MAX_CLUSTER_ZOOM + 1)]
+        # Position of each row along the Z-order curve, for spreading truncated point results
+        self.curve_rank = np.empty(len(store), dtype=np.int64)
+        self.curve_rank[np.argsort(_z_order(x, y), kind="stable")] = np.arange(len(store))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(level.nbytes for level in self.levels) + self.curve_rank.nbytes
+
+    def query(self, bbox: tuple[float, float, float, float], zoom: int, limit: int = MAX_FEATURES) -> dict:
+        """
+        { "zoom", "clusters", "entrances", "truncated" } for the cells of zoom touching bbox.
+        A cluster is { "lat", "lon", "count", "agencies": {source: count} }; single-entrance
+        cells are entrance records. At most limit features, the largest clusters first.
+        """
+        if zoom > MAX_CLUSTER_ZOOM:
+            return self._points(bbox, zoom, limit)
+        level = self.levels[zoom]
+        side = _cells_per_side(zoom)
+        # Mercator y grows southwards: lat_max gives the smallest row
+        (x0, x1), (y1, y0) = mercator(np.array(bbox[:2]), np.array(bbox[2:]))
+        x0, x1 = int(x0 * side), min(int(x1 * side), side - 1)
+        y0, y1 = int(y0 * side), min(int(y1 * side), side - 1)
+        with stage("clusters"):
+            cells = level.cells_in(x0, x1, y0, y1)
+            truncated = len(cells) > limit
+            if truncated:
+                cells = cells[np.argsort(-level.count[cells], kind="stable")[:limit]]
+        with stage("results"):
+            sources = [agency.source for agency in self.store.agencies]
+            single = level.count[cells] == 1
+            grouped = cells[~single]
+            # One pass over the non-zero (cluster, agency) counts instead of a scan per cluster
+            mixes: list[dict[str, int]] = [{} for _ in range(len(grouped))]
+            nonzero_cells, nonzero_agencies = np.nonzero(level.agencies[grouped])
+            for i, a, n in zip(
+                nonzero_cells.tolist(),
+                nonzero_agencies.tolist(),
+                level.agencies[grouped[nonzero_cells], nonzero_agencies].tolist(),
+            ):
+                mixes[i][sources[a]] = n
+            clusters = [
+                {"lat": round(lat, 6), "lon": round(lon, 6), "count": count, "agencies": mix}
+                for lat, lon, count, mix in zip(
+                    level.lat[grouped].tolist(), level.lon[grouped].tolist(), level.count[grouped].tolist(), mixes
+                )
+            ]
+            entrances = _records(self.store, np.sort(level.first_row[cells[single]]))
+        return {"zoom": zoom, "clusters": clusters, "entrances": entrances, "truncated": truncated}
+
+    def _points(self, bbox: tuple[float, float, float, float], zoom: int, limit: int) -> dict:
+        with stage("bbox"):
+            rows = self.store.query_bbox(bbox)
+        truncated = len(rows) > limit
+        if truncated:
+            # limit rows evenly spaced along the Z-order curve cover the whole viewport
+            along = rows[np.argsort(self.curve_rank[rows], kind="stable")]
+            rows = np.sort(along[np.linspace(0, len(along) - 1, limit).astype(np.int64)])
+        with stage("results"):
+            entrances = _records(self.store, rows)
+        return {"zoom": zoom, "clusters": [], "entrances": entrances, "truncated": truncated}
+
+
+register_derived("cluster_index", ClusterIndex)
+
+
+def get_cluster_index(store: EntranceStore) -> ClusterIndex:
+    """The ClusterIndex of store (built with it; see store.register_derived)."""
+    return store.derived("cluster_index")
+
+
+def get_clusters(
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    zoom: int,
+    limit: int = MAX_FEATURES,
+) -> dict:
+    """Clusters and single entrances for a map viewport at zoom (see ClusterIndex.query)."""
+    with stage("store"):
+        store = get_store()
+    return get_cluster_index(store).query((lat_min, lat_max, lon_min, lon_max), zoom, limit)
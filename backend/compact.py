@@ -0,0 +1,153 @@
+"""
+Compact per-agency entrance payloads for the map, instead of the raw agency CSVs.
+Layout of one payload (little-endian):
+
+    4 bytes   magic b"VFEC"
+    4 bytes   uint32 header length H
+    H bytes   UTF-8 JSON header {"format", "source", "count", "scale", "nameIdBytes", "names"},
+              space-padded so the arrays below start 4-byte aligned
+    4n bytes  int32 lat, fixed point (degrees * scale), delta-encoded: the first value
+              absolute, then each row minus the previous one
+    4n bytes  int32 lon, same encoding
+    kn bytes  uint16 (k = 2) or uint32 (k = 4) index into names, per row
+
+Rows are the agency's entrances in file order. Coordinates are rounded half up to 1e-6
+degrees, the precision the CSV loaders and every API response already use; station names
+are stored once each. Neighbouring entrances are metres apart, so the deltas are small
+numbers whose high bytes gzip and brotli squeeze out.
+
+build_payloads() encodes every agency of a store with gzip (and brotli, when the brotli
+package is installed) variants, so the endpoint and scripts/build_payloads.py never
+compress per request.
+"""
+import gzip
+import hashlib
+import json
+import struct
+from dataclasses import dataclass
+
+import numpy as np
+
+from store import Agency, EntranceStore, register_derived
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MAGIC = b"VFEC"
+FORMAT = 1
+SCALE = 1_000_000
+MEDIA_TYPE = "application/vnd.venue-finder.entrances"
+
+
+class InvalidPayload(ValueError):
+    """Bytes that are not a compact entrance payload of a supported format."""
+
+
+def fixed_point(degrees: np.ndarray) -> np.ndarray:
+    """degrees * SCALE rounded half up (JavaScript's Math.round), as int64."""
+    return np.floor(np.asarray(degrees, dtype=np.float64) * SCALE + 0.5).astype(np.int64)
+
+
+def encode_agency(store: EntranceStore, agency: Agency) -> bytes:
+    """The compact payload of one agency's entrances."""
+    ids = store.name_id[agency.start:agency.stop]
+    # Per-agency name dictionary, in order of first appearance
+    unique, first, inverse = np.unique(ids, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    names = [store.names[i] for i in unique[order].tolist()]
+    name_ids = rank[inverse]
+    id_dtype = "<u2" if len(names) <= 0xFFFF else "<u4"
+
+    header = json.dumps({
+        "format": FORMAT,
+        "source": agency.source,
+        "count": agency.stop - agency.start,
+        "scale": SCALE,
+        "nameIdBytes": np.dtype(id_dtype).itemsize,
+        "names": names,
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    header += b" " * (-len(header) % 4)
+    columns = [
+        np.diff(fixed_point(store.lat[agency.start:agency.stop]), prepend=0).astype("<i4"),
+        np.diff(fixed_point(store.lon[agency.start:agency.stop]), prepend=0).astype("<i4"),
+        name_ids.astype(id_dtype),
+    ]
+    return b"".join([MAGIC, struct.pack("<I", len(header)), header, *(c.tobytes() for c in columns)])
+
+
+def decode(data: bytes) -> dict:
+    """
+    { "source", "names", "nameId", "lat", "lon" } of a payload: nameId indexes names,
+    lat/lon are float64 degrees. Raises InvalidPayload for anything else.
+    """
+    if len(data) < 8 or data[:4] != MAGIC:
+        raise InvalidPayload("not a compact entrance payload")
+    (header_len,) = struct.unpack_from("<I", data, 4)
+    header = json.loads(data[8:8 + header_len])
+    if header.get("format") != FORMAT:
+        raise InvalidPayload(f"unsupported payload format {header.get('format')!r}")
+    n = header["count"]
+    offset = 8 + header_len
+    lat = np.frombuffer(data, "<i4", n, offset)
+    lon = np.frombuffer(data, "<i4", n, offset + 4 * n)
+    name_id = np.frombuffer(data, "<u2" if header["nameIdBytes"] == 2 else "<u4", n, offset + 8 * n)
+    return {
+        "source": header["source"],
+        "names": header["names"],
+        "nameId": name_id,
+        "lat": np.cumsum(lat, dtype=np.int64) / header["scale"],
+        "lon": np.cumsum(lon, dtype=np.int64) / header["scale"],
+    }
+
+
+@dataclass(frozen=True)
+class Payload:
+    """One agency's payload with its precompressed variants; etag is a digest of the uncompressed bytes."""
+    etag: str
+    identity: bytes
+    gzip: bytes
+    br: bytes | None
+
+    def encoded(self, encoding: str) -> bytes:
+        return {"identity": self.identity, "gzip": self.gzip, "br": self.br}[encoding]
+
+
+def make_payload(data: bytes) -> Payload:
+    return Payload(
+        etag=hashlib.sha1(data).hexdigest()[:16],
+        identity=data,
+        # mtime=0 keeps the gzip bytes, like the ETag, a function of the data alone
+        gzip=gzip.compress(data, compresslevel=9, mtime=0),
+        br=brotli.compress(data, quality=11) if brotli is not None else None,
+    )
+
+
+def build_payloads(store: EntranceStore) -> dict[str, Payload]:
+    """Payload of every agency of store, by agency key."""
+    return {agency.key: make_payload(encode_agency(store, agency)) for agency in store.agencies}
+
+
+def choose_encoding(accept_encoding: str | None, payload: Payload) -> str:
+    """The smallest variant of payload the client accepts: "br", "gzip" or "identity"."""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().lower().partition(";")
+        if coding and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.strip())
+    if payload.br is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return "identity"
+
+
+register_derived("compact_payloads", build_payloads)
+
+
+def get_payloads(store: EntranceStore) -> dict[str, Payload]:
+    """The payloads of store (built with it; see store.register_derived)."""
+    return store.derived("compact_payloads")
@@ -2,15 +2,81 @@
 Locate transit entrances from GTFS-derived data (heretech_sampledata).
 Used by GET /api/entrances in the web app.
 """
-from pathlib import Path
-import pandas as pd
-from rapidfuzz import process, fuzz
+import base64
+import binascii
+import contextvars
+import hashlib
+import heapq
+import itertools
+import math
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterator
 
-DATA_DIR = Path(__file__).resolve().parent.parent / "data" / "entrances"
-BOUNDING_FILE = DATA_DIR / "bounding.txt"
+import numpy as np
+from rapidfuzz import fuzz, process
 
-# Default: no bbox (search all sources). Pass floats: lat_min, lat_max, lon_min, lon_max.
-DEFAULT_BBOX = (float("-inf"), float("inf"), float("-inf"), float("inf"))
+from cache import LRUCache, SingleFlight
+from metrics import CANDIDATES_SCORED, SEARCHES_COALESCED, lap, stage, timer
+from names import NameQuery
+from normalize import search_key
+from store import DEFAULT_BBOX, Agency, EntranceStore, get_store
+
+# Station name matches kept per agency
+MATCH_LIMIT = 15
+# Lowest fuzz.ratio of a query key to a station key that counts as a match
+SCORE_CUTOFF = 45
+# Global ranking: candidates are scored this many at a time, best upper bound first
+RANK_BATCH = 64
+# Guards bound comparisons against float rounding
+EPSILON = 1e-9
+# Largest page a cursor-paginated listing returns
+PAGE_SIZE_MAX = 5000
+# Records built and encoded at a time when a listing is streamed
+STREAM_CHUNK = 500
+
+# Result cache in front of get_entrances (see get_entrances_cached)
+CACHE_SIZE = int(os.environ.get("ENTRANCES_CACHE_SIZE", "1024"))
+CACHE_TTL_SECONDS = float(os.environ.get("ENTRANCES_CACHE_TTL", "300"))
+CACHE_MAX_BYTES = int(os.environ.get("ENTRANCES_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Bboxes that widening to this grid (degrees, ~1 km) adds no entrances to share a cache entry; 0 = exact
+BBOX_QUANTUM = float(os.environ.get("ENTRANCES_BBOX_QUANTUM", "0.01"))
+
+search_cache = LRUCache(CACHE_SIZE, CACHE_TTL_SECONDS, CACHE_MAX_BYTES)
+# Dataset version search_cache was last cleared for; moves only to the version being served
+_cache_version = ""
+_cache_version_lock = threading.Lock()
+# Identical searches arriving together run once (see get_entrances_cached, get_entrances_ranked)
+search_flights = SingleFlight()
+
+# How _search runs the per-agency matching: "serial", "thread" (shared store) or "process"
+# (workers with their own store). See scripts/bench_executor.py for when each wins.
+EXECUTOR_MODES = ("serial", "thread", "process")
+EXECUTOR_MODE = os.environ.get("ENTRANCES_EXECUTOR", "serial")
+if EXECUTOR_MODE not in EXECUTOR_MODES:
+    raise ValueError(f"ENTRANCES_EXECUTOR must be one of {', '.join(EXECUTOR_MODES)}, not {EXECUTOR_MODE!r}")
+# There are never more than one task per agency in flight for a single search
+EXECUTOR_WORKERS = int(os.environ.get("ENTRANCES_WORKERS", "0")) or min(os.cpu_count() or 1, 10)
+_executor: Executor | None = None
+_executor_lock = threading.Lock()
+
+
+def _bbox(
+    lat_min: float | None,
+    lat_max: float | None,
+    lon_min: float | None,
+    lon_max: float | None,
+    default: tuple[float, float, float, float] = DEFAULT_BBOX,
+) -> tuple[float, float, float, float]:
+    return (
+        float(lat_min) if lat_min is not None else default[0],
+        float(lat_max) if lat_max is not None else default[1],
+        float(lon_min) if lon_min is not None else default[2],
+        float(lon_max) if lon_max is not None else default[3],
+    )
 
 
 def get_entrances(
@@ -19,135 +85,631 @@ def get_entrances(
     lat_max: float | None = None,
     lon_min: float | None = None,
     lon_max: float | None = None,
-    score_cutoff: int = 45,
+    score_cutoff: int = SCORE_CUTOFF,
 ) -> list[dict]:
     """
     Return list of entrance records: { "stationName", "source", "lat", "lon" }.
+    Names are matched on their search keys (normalize.search_key), so case, accents and
+    abbreviations like "St"/"Street" do not cost score. If the query's key is exactly the key
+    of stations inside the bbox, those stations are returned without any fuzzy scoring.
     """
     if not query or not query.strip():
         return []
 
-    bounding_box = (
-        float(lat_min) if lat_min is not None else DEFAULT_BBOX[0],
-        float(lat_max) if lat_max is not None else DEFAULT_BBOX[1],
-        float(lon_min) if lon_min is not None else DEFAULT_BBOX[2],
-        float(lon_max) if lon_max is not None else DEFAULT_BBOX[3],
-    )
+    bounding_box = _bbox(lat_min, lat_max, lon_min, lon_max)
+    with stage("store"):
+        store = get_store()
+    rows = _search(store, query, bounding_box, score_cutoff)
+    with stage("results"):
+        return _records(store, rows)
 
-    if not BOUNDING_FILE.exists():
-        return []
 
-    sources_df = pd.read_csv(BOUNDING_FILE)
-    # Handle optional leading empty column in bounding.txt
-    if "file" not in sources_df.columns and len(sources_df.columns) >= 2:
-        sources_df = pd.read_csv(BOUNDING_FILE, index_col=0)
-    if "lonMin" in sources_df.columns and "lonMax" in sources_df.columns:
-        lat_min_col, lat_max_col = "latMin", "latMax"
-        lon_min_col, lon_max_col = "lonMin", "lonMax"
+def _search(
+    store: EntranceStore, query: str, bounding_box: tuple[float, float, float, float], score_cutoff: float
+) -> np.ndarray:
+    """Row ids of every entrance of the matched stations, in get_entrances output order."""
+    with stage("name_index"):
+        name_query = store.name_index.prepare(query.strip())
+    with stage("bbox"):
+        in_bbox = store.query_bbox(bounding_box)
+    # Sources whose bounding box overlaps the request bbox (all if none overlap)
+    with stage("sources"):
+        tasks = []
+        for agency in store.overlapping(bounding_box):
+            rows = store.agency_rows(in_bbox, agency)
+            if rows.size:
+                tasks.append((agency, rows))
+
+    if name_query.exact is not None:
+        # The query is some station's name (up to case, accents and abbreviations): no fuzzy scoring
+        with stage("exact"):
+            matched = _exact_rows(store, tasks, name_query.exact)
+        if matched.size:
+            return matched
+
+    executor = _get_executor() if len(tasks) > 1 else None
+    if executor is None:
+        matched = [_match_agency(store, agency, rows, name_query, score_cutoff) for agency, rows in tasks]
+    elif EXECUTOR_MODE == "thread":
+        # Each task runs in a copy of this context so its stage timings reach the request
+        contexts = [contextvars.copy_context() for _ in tasks]
+        matched = list(executor.map(
+            lambda context, task: context.run(_match_agency, store, *task, name_query, score_cutoff), contexts, tasks
+        ))
     else:
-        lat_min_col, lat_max_col = "latMin", "latMax"
-        lon_min_col, lon_max_col = "lonMin", "lonMax"
-
-    # Sources whose bounding box overlaps the request bbox (any overlap)
-    source_matches = sources_df[
-        (sources_df[lat_max_col] >= bounding_box[0])
-        & (sources_df[lat_min_col] <= bounding_box[1])
-        & (sources_df[lon_max_col] >= bounding_box[2])
-        & (sources_df[lon_min_col] <= bounding_box[3])
+        with stage("workers"):
+            remote = list(executor.map(
+                _match_agency_in_worker,
+                [agency.file for agency, _ in tasks],
+                itertools.repeat(query),
+                itertools.repeat(bounding_box),
+                itertools.repeat(score_cutoff),
+            ))
+        matched = []
+        worker_scored = 0
+        for (agency, rows), (version, worker_rows, scored) in zip(tasks, remote):
+            # A worker that has not picked up a data reload yet answers for other row ids
+            if version != store.version:
+                worker_rows = _match_agency(store, agency, rows, name_query, score_cutoff)
+            else:
+                worker_scored += scored
+            matched.append(worker_rows)
+        CANDIDATES_SCORED.inc(worker_scored)
+    CANDIDATES_SCORED.inc(name_query.scored)
+    # Merged in bounding.txt order whatever the execution mode
+    matched = [m for m in matched if m.size]
+    return np.concatenate(matched) if matched else np.empty(0, dtype=np.int64)
+
+
+def _exact_rows(store: EntranceStore, tasks: list[tuple[Agency, np.ndarray]], exact: np.ndarray) -> np.ndarray:
+    """
+    For (agency, rows in bbox) tasks, the rows of stations whose name id is in exact, per agency
+    at most MATCH_LIMIT of them in first-appearance order: what _match_agency returns when
+    they are the only stations that score (all 100).
+    """
+    matched = []
+    for _, rows in tasks:
+        hits = rows[np.isin(store.name_id[rows], exact)]
+        if hits.size:
+            matched.append(_station_rows(store, hits, store.station_ids(hits)[:MATCH_LIMIT].tolist()))
+    return np.concatenate(matched) if matched else np.empty(0, dtype=np.int64)
+
+
+def _match_agency(
+    store: EntranceStore, agency: Agency, rows: np.ndarray, name_query: NameQuery, score_cutoff: float
+) -> np.ndarray:
+    """Rows of the agency's top MATCH_LIMIT stations among rows (already bbox-filtered)."""
+    # Runs once per agency: lap timers instead of stage() blocks keep this cheap outside requests
+    started = timer()
+    station_ids = store.station_ids(rows, agency)
+    started = lap("names", started)
+    name_matches = name_query.top(station_ids, limit=MATCH_LIMIT, score_cutoff=score_cutoff)
+    started = lap("scoring", started)
+    if not name_matches:
+        return np.empty(0, dtype=np.int64)
+    matched = _station_rows(store, rows, [station_ids[pos] for pos, _ in name_matches])
+    lap("results", started)
+    return matched
+
+
+def _match_agency_in_worker(
+    agency_file: str, query: str, bounding_box: tuple[float, float, float, float], score_cutoff: float
+) -> tuple[str, np.ndarray, int]:
+    """
+    Process pool task: _match_agency against the worker's own store, tagged with its version,
+    plus the number of names it scored (the worker's metrics are never scraped).
+    """
+    store = get_store()
+    agency = store.agency(agency_file)
+    if agency is None:
+        return store.version, np.empty(0, dtype=np.int64), 0
+    rows = store.rows_in_bbox(agency, bounding_box)
+    name_query = store.name_index.prepare(query.strip())
+    return store.version, _match_agency(store, agency, rows, name_query, score_cutoff), name_query.scored
+
+
+def set_executor(mode: str, workers: int | None = None) -> None:
+    """Switch how _search fans out per-agency matching: "serial", "thread" or "process"."""
+    global EXECUTOR_MODE, EXECUTOR_WORKERS, _executor
+    if mode not in EXECUTOR_MODES:
+        raise ValueError(f"Unknown executor mode {mode!r}; expected one of {', '.join(EXECUTOR_MODES)}")
+    shutdown_executor()
+    with _executor_lock:
+        EXECUTOR_MODE = mode
+        EXECUTOR_WORKERS = workers or EXECUTOR_WORKERS
+
+
+def shutdown_executor() -> None:
+    """Stop the per-agency worker pool, if one was started."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+def _get_executor() -> Executor | None:
+    global _executor
+    if EXECUTOR_MODE == "serial":
+        return None
+    executor = _executor
+    if executor is None:
+        with _executor_lock:
+            if _executor is None:
+                if EXECUTOR_MODE == "thread":
+                    _executor = ThreadPoolExecutor(EXECUTOR_WORKERS, thread_name_prefix="entrances")
+                else:
+                    # spawn, not fork: the API process runs threads; workers load their own store
+                    _executor = ProcessPoolExecutor(
+                        EXECUTOR_WORKERS,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=get_store,
+                    )
+            executor = _executor
+    return executor
+
+
+def _station_rows(store: EntranceStore, rows: np.ndarray, name_ids: list[int]) -> np.ndarray:
+    """The rows of each matched station in turn, in file order."""
+    row_names = store.name_id[rows]
+    return np.concatenate([rows[row_names == name_id] for name_id in name_ids])
+
+
+def _records(store: EntranceStore, rows: np.ndarray) -> list[dict]:
+    """API records { "stationName", "source", "lat", "lon" } for rows, in order, built column-wise."""
+    names = store.names
+    sources = [agency.source for agency in store.agencies]
+    return [
+        {"stationName": names[name_id], "source": sources[agency_idx], "lat": lat, "lon": lon}
+        for name_id, agency_idx, lat, lon in zip(
+            store.name_id[rows].tolist(),
+            store.agency_of(rows).tolist(),
+            store.lat6[rows].tolist(),
+            store.lon6[rows].tolist(),
+        )
     ]
-    if source_matches.empty and bounding_box != DEFAULT_BBOX:
-        source_matches = sources_df  # fallback: search all if no overlap
-    elif source_matches.empty:
-        source_matches = sources_df
-
-    results: list[dict] = []
-    for _, row in source_matches.iterrows():
-        file_name = row["file"]
-        if not isinstance(file_name, str) or not file_name.endswith(".txt"):
-            continue
-        csv_path = DATA_DIR / file_name
-        if not csv_path.exists():
-            continue
-        try:
-            source_csv = pd.read_csv(csv_path)
-        except Exception:
-            continue
-        if "stationName" not in source_csv.columns or "lat" not in source_csv.columns or "lon" not in source_csv.columns:
+
+
+def get_entrances_ranked(
+    query: str,
+    lat_min: float | None = None,
+    lat_max: float | None = None,
+    lon_min: float | None = None,
+    lon_max: float | None = None,
+    limit: int = MATCH_LIMIT,
+    offset: int = 0,
+    score_cutoff: int = SCORE_CUTOFF,
+    store: EntranceStore | None = None,
+) -> dict:
+    """
+    One ranking of matching stations across all agencies (instead of up to MATCH_LIMIT per
+    agency): stations offset .. offset + limit by score, ties by agency (bounding.txt order)
+    then first appearance, with all their entrances. Searches store (default: get_store()).
+    Returns { "entrances", "stations", "candidatesScored", "candidatesTotal" }.
+
+    A bounded heap keeps the best offset + limit stations seen so far. Agencies, and names
+    within an agency, are visited in descending order of their name index upper bound;
+    once the heap is full, anything whose bound is below the heap's worst score is skipped
+    without scoring.
+    """
+    if not query or not query.strip() or limit <= 0:
+        return {"entrances": [], "stations": 0, "candidatesScored": 0, "candidatesTotal": 0}
+
+    bounding_box = _bbox(lat_min, lat_max, lon_min, lon_max)
+    if store is None:
+        with stage("store"):
+            store = get_store()
+    # Concurrent requests for the same ranking page share one computation
+    key = ("ranked", store.version, search_key(query), bounding_box, limit, offset, score_cutoff)
+    result, shared = search_flights.do(key, lambda: _rank(store, query, bounding_box, limit, offset, score_cutoff))
+    if shared:
+        SEARCHES_COALESCED.inc()
+    return result
+
+
+def _rank(
+    store: EntranceStore,
+    query: str,
+    bounding_box: tuple[float, float, float, float],
+    limit: int,
+    offset: int,
+    score_cutoff: int,
+) -> dict:
+    """get_entrances_ranked for one store and bbox."""
+    with stage("name_index"):
+        name_query = store.name_index.prepare(query.strip())
+    with stage("bbox"):
+        in_bbox = store.query_bbox(bounding_box)
+    capacity = offset + limit
+    total = 0
+    # (best bound, agency index, rows in bbox, station ids, their bounds, eligible positions by bound)
+    sources = []
+    # Rows in bbox by agency index, for every agency with any
+    agency_rows = {}
+    # Heap items (100, -agency index, -position, name id) of every station whose key equals the query key
+    exact = []
+    with stage("sources"):
+        overlapping = {agency.file for agency in store.overlapping(bounding_box)}
+        for agency_idx, agency in enumerate(store.agencies):
+            if agency.file not in overlapping:
+                continue
+            rows = store.agency_rows(in_bbox, agency)
+            if not rows.size:
+                continue
+            agency_rows[agency_idx] = rows
+            station_ids = store.station_ids(rows, agency)
+            total += len(station_ids)
+            is_exact = np.zeros(len(station_ids), dtype=bool)
+            if name_query.exact is not None:
+                is_exact = np.isin(station_ids, name_query.exact)
+                exact.extend((100.0, -agency_idx, -pos, int(station_ids[pos])) for pos in np.flatnonzero(is_exact).tolist())
+            bounds = name_query.bounds[station_ids]
+            # Exact-key stations are already placed at 100 and need no scoring
+            eligible = np.flatnonzero((bounds >= score_cutoff - EPSILON) & ~is_exact)
+            if eligible.size:
+                order = eligible[np.argsort(-bounds[eligible], kind="stable")]
+                sources.append((bounds[order[0]], agency_idx, rows, station_ids, bounds, order))
+        sources.sort(key=lambda source: (-source[0], source[1]))
+
+    # Exact-key stations all score 100 and rank first, by agency then first appearance. If they
+    # fill the page nothing else can place; otherwise the fuzzy matches rank after them.
+    heap: list[tuple[float, int, int, int]] = exact[:capacity]
+    heapq.heapify(heap)
+    scored = 0
+    if len(exact) < capacity:
+        with stage("scoring"):
+            for best_bound, agency_idx, _, station_ids, bounds, order in sources:
+                if len(heap) >= capacity and best_bound < heap[0][0] - EPSILON:
+                    # Sources are sorted by best bound, so no later source can place either
+                    break
+                for start in range(0, len(order), RANK_BATCH):
+                    batch = order[start:start + RANK_BATCH]
+                    if len(heap) >= capacity and bounds[batch[0]] < heap[0][0] - EPSILON:
+                        break
+                    scores = name_query.scores(station_ids[batch], score_cutoff)
+                    scored += len(batch)
+                    for pos, score in zip(batch, scores):
+                        if score < score_cutoff:
+                            continue
+                        item = (float(score), -agency_idx, -int(pos), int(station_ids[pos]))
+                        if len(heap) < capacity:
+                            heapq.heappush(heap, item)
+                        elif item > heap[0]:
+                            heapq.heapreplace(heap, item)
+
+    CANDIDATES_SCORED.inc(scored)
+    ranked = sorted(heap, reverse=True)[offset:]
+    with stage("results"):
+        matched = [_station_rows(store, agency_rows[-neg_agency], [name_id]) for _, neg_agency, _, name_id in ranked]
+        rows = np.concatenate(matched) if matched else np.empty(0, dtype=np.int64)
+        records = _records(store, rows)
+    return {
+        "entrances": records,
+        "stations": len(ranked),
+        "candidatesScored": scored,
+        "candidatesTotal": total,
+    }
+
+
+def _quantize(
+    bounding_box: tuple[float, float, float, float], quantum: float
+) -> tuple[tuple, tuple[float, float, float, float]]:
+    """Widen bbox outward to a grid of quantum degrees: (hashable grid key, snapped bbox)."""
+    if quantum <= 0:
+        return bounding_box, bounding_box
+    lows = [math.floor(v / quantum) if math.isfinite(v) else v for v in bounding_box[0::2]]
+    highs = [math.ceil(v / quantum) if math.isfinite(v) else v for v in bounding_box[1::2]]
+    grid = (lows[0], highs[0], lows[1], highs[1])
+    snapped = tuple(g * quantum if math.isfinite(g) else g for g in grid)
+    return grid, snapped
+
+
+def _cache_bytes(records: list[dict]) -> int:
+    """Rough size of a cache entry: the list, each record dict and its two floats."""
+    per_record = sys.getsizeof(records[0]) + 2 * sys.getsizeof(0.0) if records else 0
+    return sys.getsizeof(records) + len(records) * per_record
+
+
+def _search_entry(
+    store: EntranceStore,
+    query: str,
+    bounding_box: tuple[float, float, float, float],
+    score_cutoff: int,
+    key: tuple,
+) -> list[dict]:
+    """Search, then cache the records under key."""
+    rows = _search(store, query, bounding_box, score_cutoff)
+    with stage("results"):
+        records = _records(store, rows)
+    search_cache.put(key, records, _cache_bytes(records))
+    return records
+
+
+def _sync_cache_version() -> None:
+    """
+    Clear search_cache once the store has been reloaded. Compares against the store being
+    served, not a request's own: a request still on the old store must not clear the cache
+    again or move the version back.
+    """
+    global _cache_version
+    with _cache_version_lock:
+        version = get_store().version
+        if version != _cache_version:
+            # Data files changed and the store reloaded: nothing cached so far is valid
+            search_cache.clear()
+            _cache_version = version
+
+
+def get_entrances_cached(
+    query: str,
+    lat_min: float | None = None,
+    lat_max: float | None = None,
+    lon_min: float | None = None,
+    lon_max: float | None = None,
+    score_cutoff: int = SCORE_CUTOFF,
+    store: EntranceStore | None = None,
+) -> list[dict]:
+    """
+    get_entrances on store (default: get_store()) behind search_cache. The key is the normalized query (its token sort key),
+    the bbox, the score cutoff and the dataset version. The search always runs on the requested
+    bbox; when widening it to the BBOX_QUANTUM grid adds no entrances (and no agencies), the
+    result is provably the same and is keyed by the grid cell instead, so repeated queries from
+    slightly panned viewports share one entry.
+    """
+    if not query or not query.strip():
+        return []
+
+    if store is None:
+        with stage("store"):
+            store = get_store()
+    if store.version != _cache_version:
+        _sync_cache_version()
+    bounding_box = _bbox(lat_min, lat_max, lon_min, lon_max)
+    with stage("cache"):
+        grid, snapped = _quantize(bounding_box, BBOX_QUANTUM)
+        # The snapped bbox contains the requested one, so equal row counts mean equal row sets
+        if snapped == bounding_box or (
+            len(store.query_bbox(snapped)) == len(store.query_bbox(bounding_box))
+            and store.overlapping(snapped) == store.overlapping(bounding_box)
+        ):
+            area = ("grid", grid)
+        else:
+            area = ("bbox", bounding_box)
+        key = (store.version, search_key(query), area, score_cutoff)
+        records = search_cache.get(key)
+    if records is None:
+        # A miss while the same search is already running waits for it instead of searching too
+        records, shared = search_flights.do(key, lambda: _search_entry(store, query, bounding_box, score_cutoff, key))
+        if shared:
+            SEARCHES_COALESCED.inc()
+    return list(records)
+
+
+def get_entrances_batch(
+    queries: list[dict],
+    score_cutoff: int = SCORE_CUTOFF,
+    workers: int = 1,
+) -> list[list[dict]]:
+    """
+    Resolve many station queries at once. Each item is { "query", and optionally "lat_min",
+    "lat_max", "lon_min", "lon_max" }; the result at index i equals get_entrances(**queries[i]).
+    Names are scored with one rapidfuzz cdist pass per agency for all queries that touch it;
+    workers is passed to cdist (-1 uses every core). Repeated queries (same search key and
+    bbox) are resolved once and share one result list.
+    """
+    store = get_store()
+    results: list[list[dict]] = [[] for _ in queries]
+    # agency file -> [(query index, rows in bbox, station ids in first-appearance order)]
+    work: dict[str, list[tuple[int, np.ndarray, np.ndarray]]] = {}
+    keys: list[str] = []
+    # (search key, bbox) -> index of the first query asking for it; later copies -> that index
+    first_of: dict[tuple, int] = {}
+    copy_of: dict[int, int] = {}
+    for i, item in enumerate(queries):
+        query = item.get("query")
+        keys.append(search_key(query) if query else "")
+        if not query or not query.strip():
             continue
-        filtered = source_csv[
-            (source_csv["lat"] >= bounding_box[0])
-            & (source_csv["lat"] <= bounding_box[1])
-            & (source_csv["lon"] >= bounding_box[2])
-            & (source_csv["lon"] <= bounding_box[3])
-        ]
-        if filtered.empty:
+        bounding_box = _bbox(item.get("lat_min"), item.get("lat_max"), item.get("lon_min"), item.get("lon_max"))
+        first = first_of.setdefault((keys[i], bounding_box), i)
+        if first != i:
+            copy_of[i] = first
             continue
-        name_matches = process.extract(
-            query.strip(),
-            filtered["stationName"].dropna().astype(str).str.strip().unique().tolist(),
-            scorer=fuzz.token_sort_ratio,
-            limit=15,
-            score_cutoff=score_cutoff,
-        )
-        if not name_matches:
+        in_bbox = store.query_bbox(bounding_box)
+        tasks = []
+        for agency in store.overlapping(bounding_box):
+            rows = store.agency_rows(in_bbox, agency)
+            if rows.size:
+                tasks.append((agency, rows))
+        exact = store.name_index.exact_ids(keys[i])
+        if exact is not None:
+            # Same short-circuit as _search: exact-key stations only, nothing to score
+            matched = _exact_rows(store, tasks, exact)
+            if matched.size:
+                results[i] = _records(store, matched)
+                continue
+        for agency, rows in tasks:
+            work.setdefault(agency.file, []).append((i, rows, store.station_ids(rows, agency)))
+
+    # Agencies are merged back in bounding.txt order, as get_entrances does
+    per_query: dict[int, list[np.ndarray]] = {}
+    for agency in store.agencies:
+        tasks = work.get(agency.file)
+        if not tasks:
             continue
-        for match_name, score, _ in name_matches:
-            rows = filtered[filtered["stationName"] == match_name]
-            source_label = file_name.replace(".txt", "").upper()
-            for _, r in rows.iterrows():
-                results.append({
-                    "stationName": match_name,
-                    "source": source_label,
-                    "lat": round(float(r["lat"]), 6),
-                    "lon": round(float(r["lon"]), 6),
-                })
+        agency_ids = store.agency_station_ids(agency)
+        column = np.full(len(store.names), -1, dtype=np.int64)
+        column[agency_ids] = np.arange(len(agency_ids))
+        with stage("scoring"):
+            scores = process.cdist(
+                [keys[i] for i, _, _ in tasks],
+                [store.name_index.keys[n] for n in agency_ids],
+                scorer=fuzz.ratio,
+                score_cutoff=score_cutoff,
+                dtype=np.float64,
+                workers=workers,
+            )
+        CANDIDATES_SCORED.inc(scores.size)
+        for task_row, (i, rows, station_ids) in enumerate(tasks):
+            candidate_scores = scores[task_row, column[station_ids]]
+            hits = np.flatnonzero(candidate_scores >= score_cutoff)
+            # Best score first, ties by first appearance -- the process.extract order
+            best = hits[np.lexsort((hits, -candidate_scores[hits]))][:MATCH_LIMIT]
+            if best.size:
+                per_query.setdefault(i, []).append(_station_rows(store, rows, [station_ids[pos] for pos in best]))
+    for i, chunks in per_query.items():
+        results[i] = _records(store, np.concatenate(chunks))
+    for i, first in copy_of.items():
+        results[i] = results[first]
+    return results
 
+
+def get_nearest_entrances(
+    lat: float,
+    lon: float,
+    k: int = 10,
+    max_meters: float | None = None,
+) -> list[dict]:
+    """
+    Return the k entrances nearest to (lat, lon) across all agencies, nearest first:
+    { "stationName", "source", "lat", "lon", "distanceMeters" }.
+    Entrances farther than max_meters (if given) are left out.
+    """
+    with stage("store"):
+        store = get_store()
+    if k <= 0 or not len(store):
+        return []
+    with stage("bbox"):
+        rows, distances = store.spatial.nearest(float(lat), float(lon), k, max_meters)
+    with stage("results"):
+        results = _records(store, rows)
+        for record, distance in zip(results, distances.tolist()):
+            record["distanceMeters"] = round(distance, 1)
     return results
 
 
-# CTA (Chicago Transit Authority) data file - same format as other sources
-CTA_FILE = DATA_DIR / "cta.txt"
-# Chicago CTA bounding box (from bounding.txt)
-CTA_BBOX = (41.721558, 42.073623, -87.904004, -87.605799)
+class UnknownAgency(LookupError):
+    """No agency with this name is loaded."""
 
 
-def get_cta_entrances(
+class InvalidCursor(ValueError):
+    """A pagination cursor that is malformed, stale, or was issued for another listing."""
+
+
+def _listing_id(agency: Agency, bbox: tuple[float, float, float, float]) -> str:
+    """Short hash of the listing (agency and bbox) a cursor pages through."""
+    return hashlib.sha1(repr((agency.key, bbox)).encode()).hexdigest()[:12]
+
+
+def encode_cursor(store: EntranceStore, agency: Agency, bbox: tuple[float, float, float, float], after_row: int) -> str:
+    """Opaque cursor for the page after row after_row (a store row index) of agency in bbox, in store's version."""
+    text = f"{store.version}:{agency.key}:{_listing_id(agency, bbox)}:{after_row}"
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+
+def decode_cursor(store: EntranceStore, agency: Agency, bbox: tuple[float, float, float, float], cursor: str) -> int:
+    """
+    The row index encoded in cursor. Raises InvalidCursor if it is malformed, stale, or was
+    issued for another agency or bbox.
+    """
+    try:
+        text = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        version, key, listing, row = text.split(":")
+        after_row = int(row)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor("Malformed cursor") from None
+    if version != store.version:
+        raise InvalidCursor("Cursor is from an older version of the data; start again without a cursor")
+    if key != agency.key or listing != _listing_id(agency, bbox):
+        raise InvalidCursor("Cursor was issued for another agency or bounding box; pass the same ones as for the first page")
+    return after_row
+
+
+class EntrancePage:
+    """
+    One page of an agency listing: the selected row indices of a store plus the cursor
+    for the page after them (None on the last page). Records are only built on demand,
+    either all at once (records) or a chunk at a time (chunks) for streaming.
+    """
+
+    def __init__(self, store: EntranceStore, rows: np.ndarray, next_cursor: str | None):
+        self.store = store
+        self.rows = rows
+        self.next_cursor = next_cursor
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def records(self) -> list[dict]:
+        with stage("results"):
+            return _records(self.store, self.rows)
+
+    def chunks(self, size: int = STREAM_CHUNK) -> Iterator[list[dict]]:
+        for start in range(0, len(self.rows), size):
+            with stage("results"):
+                chunk = _records(self.store, self.rows[start:start + size])
+            yield chunk
+
+
+def get_agency_page(
+    agency: str,
+    lat_min: float | None = None,
+    lat_max: float | None = None,
+    lon_min: float | None = None,
+    lon_max: float | None = None,
+    cursor: str | None = None,
+    page_size: int | None = None,
+    store: EntranceStore | None = None,
+) -> EntrancePage:
+    """
+    One agency's entrances ("cta", "mta", ... see Agency.key) inside the bbox, in file order.
+    The bbox defaults to the agency's row in bounding.txt. With cursor (the previous page's
+    next_cursor, for the same agency and bbox) and page_size, one page at a time. Reads
+    store (default: get_store()) and holds on to it, so a reload while the page is being
+    streamed does not mix two versions of the data.
+    Raises UnknownAgency or InvalidCursor.
+    """
+    if store is None:
+        with stage("store"):
+            store = get_store()
+    found = store.agency_by_key(agency)
+    if found is None:
+        raise UnknownAgency(agency)
+    bbox = _bbox(lat_min, lat_max, lon_min, lon_max, default=found.bbox)
+    with stage("bbox"):
+        rows = store.rows_in_bbox(found, bbox)
+    if cursor is not None:
+        rows = rows[np.searchsorted(rows, decode_cursor(store, found, bbox, cursor), side="right"):]
+    next_cursor = None
+    if page_size is not None and len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(store, found, bbox, int(rows[-1]))
+    return EntrancePage(store, rows, next_cursor)
+
+
+def get_agency_entrances(
+    agency: str,
     lat_min: float | None = None,
     lat_max: float | None = None,
     lon_min: float | None = None,
     lon_max: float | None = None,
 ) -> list[dict]:
     """
-    Parse entrance data from data/entrances/cta.txt and return records in the same
-    shape as get_entrances: { "stationName", "source", "lat", "lon" }.
-    Optionally filter by bounding box (default: full CTA area).
+    Return one agency's entrances in the same shape as get_entrances:
+    { "stationName", "source", "lat", "lon" }, optionally filtered by bounding box
+    (default: the agency's area from bounding.txt). Raises UnknownAgency.
     """
-    if not CTA_FILE.exists():
-        return []
-    bbox = (
-        float(lat_min) if lat_min is not None else CTA_BBOX[0],
-        float(lat_max) if lat_max is not None else CTA_BBOX[1],
-        float(lon_min) if lon_min is not None else CTA_BBOX[2],
-        float(lon_max) if lon_max is not None else CTA_BBOX[3],
-    )
+    return get_agency_page(agency, lat_min, lat_max, lon_min, lon_max).records()
+
+
+def get_cta_entrances(
+    lat_min: float | None = None,
+    lat_max: float | None = None,
+    lon_min: float | None = None,
+    lon_max: float | None = None,
+) -> list[dict]:
+    """get_agency_entrances for CTA (Chicago Transit Authority); [] if cta.txt is not loaded."""
     try:
-        df = pd.read_csv(CTA_FILE)
-    except Exception:
-        return []
-    if "stationName" not in df.columns or "lat" not in df.columns or "lon" not in df.columns:
+        return get_agency_entrances("cta", lat_min, lat_max, lon_min, lon_max)
+    except UnknownAgency:
         return []
-    filtered = df[
-        (df["lat"] >= bbox[0])
-        & (df["lat"] <= bbox[1])
-        & (df["lon"] >= bbox[2])
-        & (df["lon"] <= bbox[3])
-    ]
-    results = []
-    for _, r in filtered.iterrows():
-        results.append({
-            "stationName": str(r["stationName"]).strip(),
-            "source": "CTA",
-            "lat": round(float(r["lat"]), 6),
-            "lon": round(float(r["lon"]), 6),
-        })
-    return results
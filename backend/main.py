@@ -2,12 +2,57 @@
 Venue Finder API.
 GET /api/entrances returns transit entrances from GTFS-derived data (heretech_sampledata).
 """
-from fastapi import FastAPI, Query
+import hmac
+import os
+from contextlib import asynccontextmanager
+from typing import Literal
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response
+from pydantic import BaseModel, Field
+
+from clusters import MAX_FEATURES, get_clusters
+from compact import MEDIA_TYPE as COMPACT_MEDIA_TYPE, choose_encoding, get_payloads
+from entrances import (
+    PAGE_SIZE_MAX,
+    InvalidCursor,
+    UnknownAgency,
+    get_entrances_cached,
+    get_entrances_batch,
+    get_entrances_ranked,
+    get_agency_page,
+    get_nearest_entrances,
+    search_cache,
+    search_flights,
+    shutdown_executor,
+)
+from metrics import ROWS_RETURNED, MetricsMiddleware, render as render_metrics, stage
+from profiling import ACTIVE as PROFILING_ACTIVE, is_requested as profile_requested, profile_call
+from normalize import search_key
+from responses import FastJSONResponse, NDJSONResponse, cache_headers, etag_matches, request_etag
+from store import WATCH_SECONDS, build_derived, get_store, init_store, reload_status, reload_store, start_watcher, stop_watcher
+from suggest import SUGGEST_LIMIT, SUGGEST_LIMIT_MAX, suggest_stations
+from tiles import MEDIA_TYPE as TILE_MEDIA_TYPE, TILE_MAX_AGE, InvalidTile, get_tile
+
+# Bearer token for the admin endpoints that change state (reload, cache clear); unset disables them
+ADMIN_TOKEN = os.environ.get("ENTRANCES_ADMIN_TOKEN", "")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Parse every agency CSV once; requests are served from the in-memory store.
+    store = init_store()
+    # Build the typeahead and map cluster indexes and the compact payloads now rather than on the
+    # first request (reloads build them before swapping the new store in)
+    build_derived(store)
+    start_watcher(WATCH_SECONDS)
+    yield
+    stop_watcher()
+    shutdown_executor()
 
-from entrances import get_entrances, get_cta_entrances
 
-app = FastAPI(title="Venue Finder API")
+app = FastAPI(title="Venue Finder API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,45 +60,336 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Next-Cursor"],
 )
+# Outermost, so request timings include CORS handling
+app.add_middleware(MetricsMiddleware)
 
 
-@app.get("/api/entrances")
+@app.get("/api/entrances", response_class=FastJSONResponse)
 def search_entrances(
     query: str = Query(..., min_length=1, description="Station or location name"),
     lat_min: float | None = Query(None, description="Bounding box lat min"),
     lat_max: float | None = Query(None, description="Bounding box lat max"),
     lon_min: float | None = Query(None, description="Bounding box lon min"),
     lon_max: float | None = Query(None, description="Bounding box lon max"),
+    limit: int | None = Query(None, ge=1, le=200, description="Rank stations across all agencies and return this many"),
+    offset: int = Query(0, ge=0, le=1000, description="Skip this many ranked stations (with limit)"),
+    profile: str | None = Query(None, include_in_schema=False),
+    x_profile: str | None = Header(None, include_in_schema=False),
+    if_none_match: str | None = Header(None, include_in_schema=False),
 ):
-    """Search transit entrances by name (and optional bounding box). Data: BART, CTA, LA Metro, MBTA, Metra, MTA, Paris Metro, SFMTA, TFL, WMATA."""
-    results = get_entrances(
-        query=query,
-        lat_min=lat_min,
-        lat_max=lat_max,
-        lon_min=lon_min,
-        lon_max=lon_max,
+    """
+    Search transit entrances by name (and optional bounding box). Data: BART, CTA, LA Metro, MBTA, Metra, MTA, Paris Metro, SFMTA, TFL, WMATA.
+    Without limit: up to 15 station matches per agency. With limit/offset: one global ranking across agencies.
+    Responses carry an ETag of the dataset version and request; If-None-Match with it returns 304 without searching.
+    """
+    # One store for the ETag and the search, so a reload in between cannot pair them wrongly
+    with stage("store"):
+        store = get_store()
+
+    def search() -> dict:
+        if limit is not None or offset:
+            ranked = get_entrances_ranked(
+                query=query,
+                lat_min=lat_min,
+                lat_max=lat_max,
+                lon_min=lon_min,
+                lon_max=lon_max,
+                limit=limit if limit is not None else 15,
+                offset=offset,
+                store=store,
+            )
+            ROWS_RETURNED.inc(len(ranked["entrances"]))
+            return ranked
+        results = get_entrances_cached(
+            query=query,
+            lat_min=lat_min,
+            lat_max=lat_max,
+            lon_min=lon_min,
+            lon_max=lon_max,
+            store=store,
+        )
+        ROWS_RETURNED.inc(len(results))
+        return {"entrances": results}
+
+    if PROFILING_ACTIVE and profile_requested(profile, x_profile):
+        # The payload carries this run's profile: never cached, never answered with 304
+        return FastJSONResponse(profile_call(search, requested=True, label=query), headers={"Cache-Control": "no-store"})
+    # Same key as the result cache: queries with one search key return the same stations
+    etag = request_etag(
+        store.version, "entrances", search_key(query), lat_min, lat_max, lon_min, lon_max, limit, offset
     )
-    return {"entrances": results}
+    headers = cache_headers(etag)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    # Profiling is opt-in (see profiling.py); when it is off this is the only check
+    if PROFILING_ACTIVE:
+        return FastJSONResponse(profile_call(search, requested=False, label=query), headers=headers)
+    return FastJSONResponse(search(), headers=headers)
+
+
+class BatchQuery(BaseModel):
+    query: str = Field(..., min_length=1, description="Station or location name")
+    id: str | None = Field(None, description="Key for this query's results (default: the query text)")
+    lat_min: float | None = Field(None, description="Bounding box lat min")
+    lat_max: float | None = Field(None, description="Bounding box lat max")
+    lon_min: float | None = Field(None, description="Bounding box lon min")
+    lon_max: float | None = Field(None, description="Bounding box lon max")
+
+
+class BatchRequest(BaseModel):
+    queries: list[BatchQuery] = Field(..., min_length=1, max_length=10_000)
+    parallel: bool = Field(False, description="Score on all CPU cores")
+
+
+@app.post("/api/entrances/batch", response_class=FastJSONResponse)
+def search_entrances_batch(request: BatchRequest):
+    """
+    Resolve many station queries in one call. Results are keyed by each query's id (or text) and match /api/entrances per query.
+    Repeated queries are computed once; one key used for two different queries is rejected.
+    """
+    # key -> query; a repeat of the same query under its key is simply dropped
+    by_key: dict[str, dict] = {}
+    for q in request.queries:
+        key = q.id if q.id is not None else q.query
+        item = q.model_dump(exclude={"id"})
+        if by_key.setdefault(key, item) != item:
+            raise HTTPException(status_code=422, detail=f"Query key {key!r} is used for different queries: give them distinct ids")
+    results = get_entrances_batch(list(by_key.values()), workers=-1 if request.parallel else 1)
+    ROWS_RETURNED.inc(sum(len(r) for r in results))
+    return FastJSONResponse({"results": dict(zip(by_key, results))})
+
+
+@app.get("/api/entrances/nearest", response_class=FastJSONResponse)
+def nearest_entrances(
+    lat: float = Query(..., ge=-90, le=90, description="Latitude of the point to search around"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitude of the point to search around"),
+    k: int = Query(10, ge=1, le=100, description="Number of entrances to return"),
+    max_meters: float | None = Query(None, gt=0, description="Only return entrances within this distance"),
+):
+    """Return the k entrances nearest to a coordinate across all agencies, ranked by haversine distance."""
+    results = get_nearest_entrances(lat=lat, lon=lon, k=k, max_meters=max_meters)
+    ROWS_RETURNED.inc(len(results))
+    return FastJSONResponse({"entrances": results})
+
+
+@app.get("/api/stations/suggest", response_class=FastJSONResponse)
+def station_suggestions(
+    prefix: str = Query(..., min_length=1, description="What the user has typed so far"),
+    limit: int = Query(SUGGEST_LIMIT, ge=1, le=SUGGEST_LIMIT_MAX, description="Maximum suggestions"),
+):
+    """
+    Typeahead: distinct station + agency pairs whose name, or a later word of it, starts with prefix
+    (case and accents ignored). A sorted-key lookup, cheap enough for every keystroke; run the fuzzy
+    /api/entrances search on submit.
+    """
+    results = suggest_stations(prefix, limit)
+    ROWS_RETURNED.inc(len(results))
+    return FastJSONResponse({"suggestions": results})
+
+
+@app.get("/api/agencies")
+def list_agencies():
+    """The loaded agencies: key (for /api/agencies/{agency}/entrances), source, default bbox and entrance count."""
+    store = get_store()
+    return {
+        "agencies": [
+            {
+                "key": agency.key,
+                "source": agency.source,
+                "latMin": agency.lat_min,
+                "latMax": agency.lat_max,
+                "lonMin": agency.lon_min,
+                "lonMax": agency.lon_max,
+                "entrances": agency.stop - agency.start,
+            }
+            for agency in store.agencies
+        ]
+    }
+
+
+@app.get("/api/agencies/{agency}/entrances", response_class=FastJSONResponse)
+def agency_entrances(
+    agency: str,
+    lat_min: float | None = Query(None, description="Bounding box lat min (default: the agency's area from bounding.txt)"),
+    lat_max: float | None = Query(None, description="Bounding box lat max"),
+    lon_min: float | None = Query(None, description="Bounding box lon min"),
+    lon_max: float | None = Query(None, description="Bounding box lon max"),
+    format: Literal["json", "ndjson"] = Query("json", description="ndjson streams one entrance per line"),
+    cursor: str | None = Query(None, description="nextCursor of the previous page"),
+    page_size: int | None = Query(None, ge=1, le=PAGE_SIZE_MAX, description="Return at most this many entrances"),
+    if_none_match: str | None = Header(None, include_in_schema=False),
+):
+    """
+    Return one agency's entrances (agency: bart, cta, lametro, mbta, metra, mta, parismetro, sfmta, tfl, wmata),
+    optionally filtered by bounding box.
+    With page_size (and cursor): one page at a time, plus nextCursor (null on the last page).
+    With format=ndjson: streamed as newline-delimited JSON; the next cursor is in the X-Next-Cursor header.
+    Responses carry an ETag of the dataset version and request; If-None-Match with it returns 304.
+    """
+    with stage("store"):
+        store = get_store()
+    found = store.agency_by_key(agency)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Unknown agency {agency!r}; see /api/agencies")
+    etag = request_etag(store.version, "agency", found.key, lat_min, lat_max, lon_min, lon_max, format, cursor, page_size)
+    headers = cache_headers(etag)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    try:
+        page = get_agency_page(
+            agency,
+            lat_min=lat_min,
+            lat_max=lat_max,
+            lon_min=lon_min,
+            lon_max=lon_max,
+            cursor=cursor,
+            page_size=page_size,
+            store=store,
+        )
+    except UnknownAgency:
+        raise HTTPException(status_code=404, detail=f"Unknown agency {agency!r}; see /api/agencies")
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    ROWS_RETURNED.inc(len(page))
+    if format == "ndjson":
+        if page.next_cursor:
+            headers["X-Next-Cursor"] = page.next_cursor
+        return NDJSONResponse(page.chunks(), headers=headers)
+    if page_size is None and cursor is None:
+        return FastJSONResponse({"entrances": page.records()}, headers=headers)
+    return FastJSONResponse({"entrances": page.records(), "nextCursor": page.next_cursor}, headers=headers)
+
+
+@app.get("/api/agencies/{agency}/compact", response_class=Response)
+def agency_compact(
+    agency: str,
+    accept_encoding: str | None = Header(None, include_in_schema=False),
+    if_none_match: str | None = Header(None, include_in_schema=False),
+):
+    """
+    All of one agency's entrances in the compact binary encoding of compact.py (station name dictionary,
+    delta-encoded fixed-point int32 coordinates), precompressed with gzip or brotli per Accept-Encoding.
+    Revalidate with If-None-Match: 304 while the data is unchanged.
+    """
+    store = get_store()
+    found = store.agency_by_key(agency)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Unknown agency {agency!r}; see /api/agencies")
+    payload = get_payloads(store)[found.key]
+    encoding = choose_encoding(accept_encoding, payload)
+    # One ETag per representation, so a cache never pairs gzip bytes with identity validators
+    etag = f'"{payload.etag}"' if encoding == "identity" else f'"{payload.etag}-{encoding}"'
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    ROWS_RETURNED.inc(found.stop - found.start)
+    return Response(payload.encoded(encoding), media_type=COMPACT_MEDIA_TYPE, headers=headers)
+
+
+@app.get("/api/entrances/clusters", response_class=FastJSONResponse)
+def entrance_clusters(
+    zoom: int = Query(..., ge=0, le=22, description="Map zoom level (256 px Web Mercator tiles)"),
+    lat_min: float = Query(-90.0, description="Viewport lat min"),
+    lat_max: float = Query(90.0, description="Viewport lat max"),
+    lon_min: float = Query(-180.0, description="Viewport lon min"),
+    lon_max: float = Query(180.0, description="Viewport lon max"),
+    limit: int = Query(MAX_FEATURES, ge=1, le=MAX_FEATURES, description="Most clusters + entrances to return"),
+):
+    """
+    Entrances of a map viewport aggregated into grid clusters for the zoom level: { "zoom", "clusters":
+    [{ "lat", "lon", "count", "agencies" }], "entrances", "truncated" }. Single entrances come back as
+    plain records, and above zoom 16 every entrance does. Largest clusters first when limit cuts the list.
+    """
+    result = get_clusters(lat_min, lat_max, lon_min, lon_max, zoom, limit)
+    ROWS_RETURNED.inc(len(result["entrances"]))
+    return FastJSONResponse(result)
+
+
+@app.get("/api/tiles/{z}/{x}/{y}", response_class=Response)
+def entrance_tile(
+    z: int,
+    x: int,
+    y: int,
+    v: str | None = Query(None, description="Store version from /health; changes the URL, and so the cache entry, after a reload"),
+):
+    """
+    Entrances of Web Mercator tile z/x/y (XYZ scheme) as a Mapbox Vector Tile: one "entrances" point layer,
+    properties stationName, source and entrances (how many entrances of the station share the point).
+    204 when the tile is empty. Cacheable for ENTRANCES_TILE_MAX_AGE seconds.
+    """
+    try:
+        _, data = get_tile(z, x, y)
+    except InvalidTile as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    headers = {"Cache-Control": f"public, max-age={TILE_MAX_AGE}"}
+    if not data:
+        return Response(status_code=204, headers=headers)
+    return Response(data, media_type=TILE_MEDIA_TYPE, headers=headers)
 
 
-@app.get("/api/entrances/cta")
+@app.get("/api/entrances/cta", response_class=FastJSONResponse)
 def cta_entrances(
     lat_min: float | None = Query(None, description="Bounding box lat min (Chicago CTA area default)"),
     lat_max: float | None = Query(None, description="Bounding box lat max"),
     lon_min: float | None = Query(None, description="Bounding box lon min"),
     lon_max: float | None = Query(None, description="Bounding box lon max"),
+    format: Literal["json", "ndjson"] = Query("json", description="ndjson streams one entrance per line"),
+    cursor: str | None = Query(None, description="nextCursor of the previous page"),
+    page_size: int | None = Query(None, ge=1, le=PAGE_SIZE_MAX, description="Return at most this many entrances"),
+    if_none_match: str | None = Header(None, include_in_schema=False),
 ):
-    """Return all CTA (Chicago Transit Authority) entrances from data/entrances/cta.txt, optionally filtered by bounding box."""
-    results = get_cta_entrances(
-        lat_min=lat_min,
-        lat_max=lat_max,
-        lon_min=lon_min,
-        lon_max=lon_max,
-    )
-    return {"entrances": results}
+    """Return all CTA (Chicago Transit Authority) entrances: /api/agencies/cta/entrances under its original path."""
+    return agency_entrances("cta", lat_min, lat_max, lon_min, lon_max, format, cursor, page_size, if_none_match)
+
+
+@app.get("/api/admin/cache")
+def cache_stats():
+    """
+    Search result cache counters: hits, misses, evictions, expirations and approximate memory use,
+    plus singleFlight: searches computed, and coalesced into an identical one already in flight.
+    """
+    return {**search_cache.stats(), "singleFlight": search_flights.stats()}
+
+
+def require_admin(authorization: str | None = Header(None, include_in_schema=False)) -> None:
+    """Dependency of the state-changing admin endpoints: Authorization: Bearer <ENTRANCES_ADMIN_TOKEN>."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled: set ENTRANCES_ADMIN_TOKEN")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+
+@app.delete("/api/admin/cache", dependencies=[Depends(require_admin)])
+def clear_cache():
+    """Drop every cached search result."""
+    search_cache.clear()
+    return cache_stats()
+
+
+@app.post("/api/admin/reload", dependencies=[Depends(require_admin)])
+def reload_data(wait: bool = Query(False, description="Block until the new store is swapped in")):
+    """
+    Rebuild the entrance store from data/entrances/ in the background and swap it in.
+    Requests keep using the current store until then, and for good if the new one fails to load or is empty.
+    """
+    started = reload_store(wait=wait)
+    status = reload_status()
+    if wait and status["lastReloadError"]:
+        raise HTTPException(status_code=500, detail=status["lastReloadError"])
+    return {"started": started, **status, "store": get_store().stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Request latency, per-stage search timings and result counters in Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {"status": "ok", "store": get_store().stats(), **reload_status()}
@@ -0,0 +1,214 @@
+"""
+Request and per-stage timing metrics, exported in Prometheus text format.
+Counters and histograms are plain in-process objects; rendering only happens when /metrics
+is scraped. Stage timers only run inside a request handled by MetricsMiddleware (which
+binds a list for them to append to), so library callers such as the benchmark scripts pay
+little more than one context variable lookup per stage. The middleware also reports the stages of each
+response in a Server-Timing header.
+"""
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+
+ENABLED = os.environ.get("ENTRANCES_METRICS", "1") != "0"
+
+# Seconds; request and stage latencies of this API range from tens of microseconds to a few hundred ms
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+# (stage, seconds) appended by stage() within the current request, None outside one
+_stages: contextvars.ContextVar[list | None] = contextvars.ContextVar("entrance_stages", default=None)
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        # Unlabelled counters are exported as 0 from the start rather than missing
+        self._values: dict[tuple, float] = {} if label_names else {(): 0}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.label_names, labels)} {value:g}" for labels, value in values]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            series = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        names = (*self.label_names, "le")
+        for labels, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_labels(names, (*labels, le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total:.9g}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "entrances_request_duration_seconds", "Time to the response start, per route.", ("method", "route")
+)
+REQUESTS = Counter("entrances_requests_total", "HTTP requests, per route and status code.", ("method", "route", "status"))
+STAGE_SECONDS = Histogram(
+    "entrances_stage_duration_seconds", "Time spent per search stage within a request.", ("stage",)
+)
+CANDIDATES_SCORED = Counter(
+    "entrances_candidates_scored_total", "Station names scored by rapidfuzz (after name index pruning)."
+)
+ROWS_RETURNED = Counter("entrances_rows_returned_total", "Entrance records returned to clients.")
+SEARCHES_COALESCED = Counter(
+    "entrances_searches_coalesced_total", "Searches answered by an identical search already in flight (computations saved)."
+)
+
+REGISTRY = [REQUEST_SECONDS, REQUESTS, STAGE_SECONDS, CANDIDATES_SCORED, ROWS_RETURNED, SEARCHES_COALESCED]
+
+
+class _Stage:
+    __slots__ = ("name", "records", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.records = _stages.get()
+        if self.records is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.records is not None:
+            # list.append is atomic, so stages run on executor threads can report into the same list
+            self.records.append((self.name, time.perf_counter() - self.started))
+
+
+def stage(name: str) -> _Stage:
+    """
+    Context manager timing one search stage of the current request:
+        with stage("bbox"):
+            rows = store.query_bbox(bbox)
+    A stage entered several times in a request (e.g. once per agency) is summed. Work run on
+    another thread counts if it runs in a contextvars.copy_context() of the request's context.
+    """
+    return _Stage(name)
+
+
+def timer() -> float | None:
+    """
+    Start a lap timer for a hot loop, where a `with stage()` per iteration would cost too much
+    outside requests: None (and lap() a no-op) unless stages are being recorded.
+        started = timer()
+        ...
+        started = lap("names", started)
+    """
+    return time.perf_counter() if _stages.get() is not None else None
+
+
+def lap(name: str, started: float | None) -> float | None:
+    """Record the time since started as stage name; returns the start of the next lap."""
+    if started is None:
+        return None
+    now = time.perf_counter()
+    records = _stages.get()
+    if records is not None:
+        records.append((name, now - started))
+    return now
+
+
+def _stage_totals(records: list) -> dict[str, float]:
+    totals: dict[str, float] = {}
+    for name, seconds in records:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return totals
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: times each HTTP request to its response start, collects the stage
+    timings recorded while handling it, and adds them as a Server-Timing header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+        records: list = []
+        token = _stages.set(records)
+        started = time.perf_counter()
+        status = 500
+        elapsed = None
+
+        async def send_with_timing(message):
+            nonlocal status, elapsed
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - started
+                status = message["status"]
+                entries = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in _stage_totals(records).items()]
+                entries.append(f"total;dur={elapsed * 1000:.3f}")
+                headers = [*message.get("headers", []), (b"server-timing", ", ".join(entries).encode("latin-1"))]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _stages.reset(token)
+            if elapsed is None:
+                elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            # Route templates, not raw paths, keep the label set bounded
+            route_label = getattr(route, "path", "unmatched")
+            REQUEST_SECONDS.observe(elapsed, scope["method"], route_label)
+            REQUESTS.inc(1, scope["method"], route_label, str(status))
+            for name, seconds in _stage_totals(records).items():
+                STAGE_SECONDS.observe(seconds, name)
@@ -0,0 +1,143 @@
+"""
+Station name index for fuzzy search.
+Built once over the store's interned station names. Each name is kept as its search key
+(normalize.search_key: folded, abbreviations expanded, tokens sorted), so matching is a
+plain fuzz.ratio on prepared strings and "Chatelet" or "Times Square" score 100 against
+"Châtelet" and "Times Sq". Queries whose key equals some name's key exactly can skip
+scoring altogether (NameQuery.exact). A character-count index (one row of per-name counts
+for every character in the corpus) gives an upper bound on that ratio for all names
+in one numpy pass: ratio = 200 * LCS / (len_a + len_b), and the LCS can never exceed
+the number of characters the two strings share. Names whose bound cannot reach the
+score cutoff, or the current top-k, never reach rapidfuzz.
+"""
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from normalize import search_key
+
+# Guards bound comparisons against float rounding; bounds are only used for pruning
+EPSILON = 1e-9
+# Above this many surviving candidates (x limit), score the best-bounded ones first to raise the bar
+PROBE_FACTOR = 4
+
+
+def _char_counts(text: str) -> dict[str, int]:
+    counts: dict[str, int] = {}
+    for ch in text:
+        counts[ch] = counts.get(ch, 0) + 1
+    return counts
+
+
+class NameQuery:
+    """
+    A query prepared against a NameIndex: its search key, the ratio bound for every name,
+    and the ids of names with exactly this key (None if there are none).
+    """
+
+    def __init__(self, index: "NameIndex", key: str, bounds: np.ndarray):
+        self.index = index
+        self.key = key
+        self.bounds = bounds
+        self.exact = index.exact_ids(key)
+        # Names handed to rapidfuzz per call; appends are atomic, so thread-pool tasks may share a query
+        self._scored: list[int] = []
+
+    @property
+    def scored(self) -> int:
+        """Names scored by rapidfuzz so far for this query (the rest were pruned by their bound)."""
+        return sum(self._scored)
+
+    def top(self, ids: np.ndarray, limit: int, score_cutoff: float) -> list[tuple[int, float]]:
+        """
+        Same ranking as process.extract(query, [names[i] for i in ids], scorer=fuzz.ratio,
+        processor=search_key, limit=limit, score_cutoff=score_cutoff): (position in ids, score), best first, ties by position.
+        """
+        bounds = self.bounds[ids]
+        eligible = np.flatnonzero(bounds >= score_cutoff - EPSILON)
+        if len(eligible) > PROBE_FACTOR * limit:
+            # The limit-th best score among the best-bounded names is a floor for the final top-k
+            probe = np.sort(eligible[np.argsort(-bounds[eligible], kind="stable")[:limit]])
+            probed = self._extract(ids, probe, limit, score_cutoff)
+            if len(probed) == limit:
+                eligible = eligible[bounds[eligible] >= probed[-1][1] - EPSILON]
+        return self._extract(ids, eligible, limit, score_cutoff)
+
+    def scores(self, ids: np.ndarray, score_cutoff: float = 0) -> np.ndarray:
+        """Exact ratio of the query key against the keys of names ids (0 where below score_cutoff)."""
+        if not len(ids):
+            return np.empty(0, dtype=np.float64)
+        keys = self.index.keys
+        self._scored.append(len(ids))
+        return process.cdist(
+            [self.key], [keys[i] for i in ids], scorer=fuzz.ratio, score_cutoff=score_cutoff, dtype=np.float64
+        )[0]
+
+    def _extract(self, ids: np.ndarray, positions: np.ndarray, limit: int, score_cutoff: float) -> list[tuple[int, float]]:
+        keys = self.index.keys
+        self._scored.append(len(positions))
+        matches = process.extract(
+            self.key,
+            [keys[i] for i in ids[positions]],
+            scorer=fuzz.ratio,
+            limit=limit,
+            score_cutoff=score_cutoff,
+        )
+        return [(int(positions[idx]), score) for _, score, idx in matches]
+
+
+class NameIndex:
+    """Character counts over station name search keys (ids match EntranceStore.names)."""
+
+    def __init__(self, names: list[str]):
+        self.keys = [search_key(n) for n in names]
+        self.lengths = np.array([len(k) for k in self.keys], dtype=np.float64)
+        self.alphabet = {ch: i for i, ch in enumerate(sorted({ch for k in self.keys for ch in k}))}
+        # counts[c, i]: occurrences of character c in key i
+        self.counts = np.zeros((len(self.alphabet), len(self.keys)), dtype=np.uint16)
+        for name_id, key in enumerate(self.keys):
+            for ch, count in _char_counts(key).items():
+                self.counts[self.alphabet[ch], name_id] = count
+        self._by_key = self._group_keys(self.keys)
+
+    @classmethod
+    def from_arrays(cls, keys: list[str], alphabet: str, counts: np.ndarray, lengths: np.ndarray) -> "NameIndex":
+        """An index built earlier (e.g. read from a snapshot): keys and alphabet in order, arrays as __init__ computes them."""
+        index = cls.__new__(cls)
+        index.keys = keys
+        index.lengths = lengths
+        index.alphabet = {ch: i for i, ch in enumerate(alphabet)}
+        index.counts = counts
+        index._by_key = cls._group_keys(keys)
+        return index
+
+    @staticmethod
+    def _group_keys(keys: list[str]) -> dict[str, np.ndarray]:
+        grouped: dict[str, list[int]] = {}
+        for name_id, key in enumerate(keys):
+            grouped.setdefault(key, []).append(name_id)
+        return {key: np.array(ids, dtype=np.int64) for key, ids in grouped.items()}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def nbytes(self) -> int:
+        return self.lengths.nbytes + self.counts.nbytes
+
+    def exact_ids(self, key: str) -> np.ndarray | None:
+        """Ids (ascending) of the names whose search key is key, or None."""
+        return self._by_key.get(key) if key else None
+
+    def upper_bounds(self, key: str) -> np.ndarray:
+        """Upper bound of fuzz.ratio(key, self.keys[i]) for every name id i."""
+        counts = {self.alphabet[ch]: n for ch, n in _char_counts(key).items() if ch in self.alphabet}
+        if not counts:
+            return np.zeros(len(self.keys), dtype=np.float64)
+        rows = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+        wanted = np.fromiter(counts.values(), dtype=np.int32, count=len(counts))
+        shared = np.minimum(self.counts[rows], wanted[:, None]).sum(axis=0, dtype=np.int32)
+        return 200.0 * shared / (self.lengths + len(key))
+
+    def prepare(self, query: str) -> NameQuery:
+        key = search_key(query)
+        return NameQuery(self, key, self.upper_bounds(key))
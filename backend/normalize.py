@@ -0,0 +1,75 @@
+"""
+Station name normalization, for prefix lookups and fuzzy search keys.
+normalize() case-folds, strips accents and treats punctuation as a word break, so
+"Saint-Michel", "saint michel" and "SAINT MICHEL" are one string and a query typed
+without accents still finds "Châtelet". search_key() also expands abbreviations through
+TOKEN_ALIASES ("St" -> "street", "Sq" -> "square") and sorts the words, which is what
+fuzzy matching compares (token_sort_ratio on folded names).
+"""
+import re
+import unicodedata
+
+_NON_WORD = re.compile(r"[\W_]+")
+# Dropped rather than split on, so "King's" folds to "kings"
+_APOSTROPHES = re.compile(r"['’]")
+
+# Abbreviation -> word, applied to whole words of names and queries alike
+TOKEN_ALIASES = {
+    "av": "avenue",
+    "ave": "avenue",
+    "blvd": "boulevard",
+    "centre": "center",
+    "ctr": "center",
+    "dr": "drive",
+    "ft": "fort",
+    "hts": "heights",
+    "hwy": "highway",
+    "intl": "international",
+    "jct": "junction",
+    "ln": "lane",
+    "mt": "mount",
+    "pk": "park",
+    "pkwy": "parkway",
+    "pl": "place",
+    "rd": "road",
+    "sq": "square",
+    "st": "street",
+    "sta": "station",
+    "stn": "station",
+    "sts": "streets",
+    "univ": "university",
+}
+# As the first of several words these mean a saint: "St Paul's", "Ste-Marie" ("14 St" stays a street)
+LEADING_ALIASES = {
+    "st": "saint",
+    "ste": "sainte",
+}
+
+
+def strip_accents(text: str) -> str:
+    """text without combining marks: "Châtelet" -> "Chatelet"."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def normalize(text: str) -> str:
+    """Case-folded, accent-free words of text joined by single spaces: "St. Paul's" -> "st pauls"."""
+    return _NON_WORD.sub(" ", _APOSTROPHES.sub("", strip_accents(text).casefold())).strip()
+
+
+def expand(words: list[str]) -> list[str]:
+    """words with abbreviations spelled out (see TOKEN_ALIASES and LEADING_ALIASES)."""
+    expanded = [TOKEN_ALIASES.get(word, word) for word in words]
+    if len(words) > 1 and words[0] in LEADING_ALIASES:
+        expanded[0] = LEADING_ALIASES[words[0]]
+    return expanded
+
+
+def search_key(text: str) -> str:
+    """The fuzzy search key of a name or query: normalized, expanded, words sorted and single-spaced."""
+    return " ".join(sorted(expand(normalize(text).split())))
+
+
+def word_starts(key: str) -> list[str]:
+    """Every suffix of a normalized key that starts at a word: "times sq 42" -> ["sq 42", "42"]."""
+    return [key[i + 1:] for i, ch in enumerate(key) if ch == " "]
@@ -0,0 +1,107 @@
+"""
+Opt-in cProfile capture for individual search requests.
+Off unless ENTRANCES_PROFILING=1 (on-demand: ?profile=1 or X-Profile: 1) or
+ENTRANCES_PROFILE_SAMPLE_RATE > 0 (a random fraction of requests, in the background).
+Endpoints only look at ACTIVE before doing anything else, so a disabled profiler costs
+one boolean check per request.
+
+A profiled request is saved as a .prof file (open with `python -m pstats` or snakeviz) in
+ENTRANCES_PROFILE_DIR; on-demand requests also get a summary of the top frames in their
+response. Only one request is profiled at a time: cProfile cannot run two profilers at
+once on Python 3.12+, and a second concurrent profile would only measure contention.
+"""
+import cProfile
+import os
+import pstats
+import random
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+ENABLED = os.environ.get("ENTRANCES_PROFILING", "0") == "1"
+SAMPLE_RATE = float(os.environ.get("ENTRANCES_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = Path(os.environ.get("ENTRANCES_PROFILE_DIR") or Path(tempfile.gettempdir()) / "venue-finder-profiles")
+# Oldest .prof files beyond this many are deleted
+PROFILE_KEEP = int(os.environ.get("ENTRANCES_PROFILE_KEEP", "100"))
+TOP_FRAMES = 25
+
+ACTIVE = ENABLED or SAMPLE_RATE > 0
+# Values of ?profile= / X-Profile that ask for a profile; anything else (including "0") does not
+REQUEST_VALUES = ("1", "true")
+
+_lock = threading.Lock()
+
+
+def is_requested(*values: str | None) -> bool:
+    """Whether any of a request's profile flags asks for a profile, and on-demand profiling is ENABLED."""
+    return ENABLED and any(v is not None and v.strip().lower() in REQUEST_VALUES for v in values)
+
+
+def _reason(requested: bool) -> str | None:
+    if requested and ENABLED:
+        return "requested"
+    if SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+def _save(profile: cProfile.Profile, reason: str, label: str) -> Path:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", label).strip("-")[:40] or "request"
+    path = PROFILE_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 1_000_000:06d}-{reason}-{slug}.prof"
+    profile.dump_stats(path)
+    saved = sorted(PROFILE_DIR.glob("*.prof"), key=lambda p: p.stat().st_mtime)
+    for old in saved[:max(0, len(saved) - PROFILE_KEEP)]:
+        old.unlink(missing_ok=True)
+    return path
+
+
+def summary(profile: cProfile.Profile, limit: int = TOP_FRAMES) -> list[dict]:
+    """Top frames by cumulative time: function, location, call count, own and cumulative ms."""
+    stats = pstats.Stats(profile)
+    rows = []
+    for (file_name, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+        rows.append({
+            "function": function,
+            "location": f"{os.path.basename(file_name)}:{line}" if line else file_name,
+            "calls": calls,
+            "ownMs": round(own * 1000, 3),
+            "cumulativeMs": round(cumulative * 1000, 3),
+        })
+    rows.sort(key=lambda row: row["cumulativeMs"], reverse=True)
+    return rows[:limit]
+
+
+def profile_call(fn: Callable[[], dict], requested: bool, label: str) -> dict:
+    """
+    fn() under cProfile if this request asked for it (and ENABLED) or was sampled, else
+    plainly. A requested profile adds { "file", "totalMs", "top" } to the result as "profile".
+    """
+    reason = _reason(requested)
+    if reason is None or not _lock.acquire(blocking=False):
+        result = fn()
+        if reason == "requested":
+            result = {**result, "profile": {"error": "another request is being profiled; retry"}}
+        return result
+    try:
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            result = fn()
+        finally:
+            profile.disable()
+        elapsed = time.perf_counter() - started
+        path = _save(profile, reason, label)
+        if reason == "requested":
+            result = {
+                **result,
+                "profile": {"file": str(path), "totalMs": round(elapsed * 1000, 3), "top": summary(profile)},
+            }
+        return result
+    finally:
+        _lock.release()
+
@@ -0,0 +1,77 @@
+"""
+Response classes for the entrance endpoints.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Iterable, Iterator
+
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from metrics import stage
+
+# Same settings as starlette's JSONResponse.render, so output is byte-for-byte identical
+_encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"))
+
+# Cache-Control max-age (seconds) of responses with a dataset-version ETag; 0 = revalidate every time
+HTTP_MAX_AGE = int(os.environ.get("ENTRANCES_HTTP_MAX_AGE", "60"))
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse for payloads that are already plain JSON types (dicts, lists, str, float).
+    Return it directly from an endpoint: FastAPI then skips jsonable_encoder, which walks
+    every record of a large result in Python before the C encoder ever sees it.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with stage("serialize"):
+            return _encoder.encode(content).encode("utf-8")
+
+
+def _ndjson_lines(chunks: Iterable[list[dict]]) -> Iterator[bytes]:
+    encode = _encoder.encode
+    for chunk in chunks:
+        with stage("serialize"):
+            body = "".join([encode(record) + "\n" for record in chunk]).encode("utf-8")
+        yield body
+
+
+class NDJSONResponse(StreamingResponse):
+    """
+    Newline-delimited JSON, one record per line, streamed from an iterable of record
+    chunks as they are produced: the full list is never built or encoded at once.
+    A sync iterable is drained in the threadpool, like a sync endpoint.
+    """
+
+    media_type = "application/x-ndjson"
+
+    def __init__(self, chunks: Iterable[list[dict]], status_code: int = 200, headers: dict[str, str] | None = None):
+        super().__init__(_ndjson_lines(chunks), status_code=status_code, headers=headers)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an If-None-Match header lists etag (weak comparison, as RFC 9110 asks for GET)."""
+    if not if_none_match:
+        return False
+    tag = etag.removeprefix("W/")
+    return any(
+        candidate == "*" or candidate.removeprefix("W/") == tag
+        for candidate in (part.strip() for part in if_none_match.split(","))
+    )
+
+
+def request_etag(version: str, *request: Any) -> str:
+    """
+    ETag of a response that depends only on the dataset version and the (normalized) request:
+    "<version>-<hash of request>". It changes when the data is reloaded, so clients revalidating
+    with If-None-Match get 304 until then without the request being computed again.
+    """
+    digest = hashlib.sha1(repr(request).encode("utf-8")).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+
+def cache_headers(etag: str) -> dict[str, str]:
+    """ETag and Cache-Control headers for a response, its 304 included."""
+    cache_control = f"public, max-age={HTTP_MAX_AGE}" if HTTP_MAX_AGE > 0 else "no-cache"
+    return {"ETag": etag, "Cache-Control": cache_control}
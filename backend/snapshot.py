@@ -0,0 +1,76 @@
+"""
+Binary snapshot container for the entrance store.
+One file: an 8-byte magic, a little-endian uint64 header length, a JSON header, then
+each array's raw bytes at a 64-byte aligned offset. read_snapshot() maps the file
+read-only, so the arrays are views onto the page cache: opening is close to free and
+every process that opens the same file shares the same physical pages.
+What goes in the header and which arrays are stored is up to the caller (store.py).
+"""
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = b"ENTSNAP1"
+ALIGN = 64
+_LENGTH = struct.Struct("<Q")
+
+
+class SnapshotError(ValueError):
+    """The file is not a snapshot this code can read."""
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGN) * ALIGN
+
+
+def write_snapshot(path: Path, header: dict, arrays: dict[str, np.ndarray]) -> None:
+    """
+    Write header and arrays to path. The file is written beside path and renamed over it,
+    so processes that have the old snapshot mapped keep reading the old, intact file.
+    """
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        layout[name] = {"offset": offset, "dtype": array.dtype.newbyteorder("<").str, "shape": list(array.shape)}
+        offset = _aligned(offset + array.nbytes)
+    header_bytes = json.dumps({**header, "arrays": layout}, ensure_ascii=False).encode("utf-8")
+    data_start = _aligned(len(MAGIC) + _LENGTH.size + len(header_bytes))
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + _LENGTH.pack(len(header_bytes)) + header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(array.astype(layout[name]["dtype"], copy=False).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path: Path) -> tuple[dict, dict[str, np.ndarray]]:
+    """Map path read-only; returns the header and read-only array views into the mapping."""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    prefix = len(MAGIC) + _LENGTH.size
+    if len(buffer) < prefix or buffer[:len(MAGIC)] != MAGIC:
+        raise SnapshotError(f"{path} is not an entrance snapshot")
+    (header_length,) = _LENGTH.unpack(buffer[len(MAGIC):prefix])
+    try:
+        header = json.loads(buffer[prefix:prefix + header_length].decode("utf-8"))
+    except ValueError as exc:
+        raise SnapshotError(f"{path} has a corrupt header") from exc
+    data_start = _aligned(prefix + header_length)
+    arrays = {}
+    for name, spec in header.pop("arrays").items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        start = data_start + spec["offset"]
+        if start + count * dtype.itemsize > len(buffer):
+            raise SnapshotError(f"{path} is truncated")
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=start).reshape(spec["shape"])
+    return header, arrays
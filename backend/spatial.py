@@ -0,0 +1,198 @@
+"""
+Static packed R-tree over entrance coordinates.
+Points are sorted once into STR (sort-tile-recursive) order and grouped into nodes of
+NODE_SIZE; each level stores the bounding boxes of the nodes below it. Queries walk the
+tree level by level with numpy, so a bbox lookup costs O(log n + k) array work instead
+of a full lat/lon mask over every row.
+"""
+import math
+
+import numpy as np
+
+NODE_SIZE = 32
+
+EARTH_RADIUS_M = 6_371_008.8
+# First search radius for nearest(); grows 4x until k entrances are inside it
+NEAREST_START_M = 250.0
+# Web Mercator is undefined at the poles
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def haversine_m(lat1: float, lon1: float, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """Great-circle distance in meters from one point to arrays of points."""
+    p1, p2 = np.radians(lat1), np.radians(lat2)
+    dlat = p2 - p1
+    dlon = np.radians(lon2 - lon1)
+    a = np.sin(dlat / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def radius_bbox(lat: float, lon: float, radius_m: float) -> tuple[float, float, float, float]:
+    """Smallest lat/lon box containing every point within radius_m of (lat, lon)."""
+    d = radius_m / EARTH_RADIUS_M
+    if d >= math.pi:
+        return (-90.0, 90.0, -180.0, 180.0)
+    dlat = math.degrees(d)
+    lat_min, lat_max = lat - dlat, lat + dlat
+    if lat_min <= -90 or lat_max >= 90:
+        # Circle covers a pole: every longitude is in range
+        return (max(lat_min, -90.0), min(lat_max, 90.0), -180.0, 180.0)
+    dlon = math.degrees(math.asin(math.sin(d) / math.cos(math.radians(lat))))
+    if lon - dlon < -180 or lon + dlon > 180:
+        return (lat_min, lat_max, -180.0, 180.0)
+    return (lat_min, lat_max, lon - dlon, lon + dlon)
+
+
+def mercator(lat: np.ndarray, lon: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Web Mercator x, y in [0, 1] (y grows southwards, as in map tiles)."""
+    phi = np.radians(np.clip(lat, -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(phi) + 1.0 / np.cos(phi)) / math.pi) / 2.0
+    return np.clip(x, 0.0, 1.0), np.clip(y, 0.0, 1.0)
+
+
+def tile_bbox(z: int, x: int, y: int, buffer: float = 0.0) -> tuple[float, float, float, float]:
+    """
+    (lat_min, lat_max, lon_min, lon_max) of Web Mercator tile z/x/y (XYZ scheme, y = 0 at the
+    north), widened by buffer tile widths on every side.
+    """
+    n = 1 << z
+
+    def lat(row: float) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * min(max(row, 0.0), n) / n))))
+
+    def lon(col: float) -> float:
+        return min(max(col, 0.0), n) / n * 360.0 - 180.0
+
+    return (lat(y + 1 + buffer), lat(y - buffer), lon(x - buffer), lon(x + 1 + buffer))
+
+
+def _expand(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """Concatenate the integer ranges [starts[i], stops[i])."""
+    lengths = stops - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    ends = np.cumsum(lengths)
+    return np.repeat(starts - ends + lengths, lengths) + np.arange(total)
+
+
+def _str_order(lat: np.ndarray, lon: np.ndarray, node_size: int) -> np.ndarray:
+    """Permutation putting points in STR order: vertical lon slices, each sorted by lat."""
+    n = len(lat)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    slice_count = math.ceil(math.sqrt(math.ceil(n / node_size)))
+    slice_size = slice_count * node_size
+    slice_of = np.empty(n, dtype=np.int64)
+    slice_of[np.argsort(lon, kind="stable")] = np.arange(n) // slice_size
+    return np.lexsort((lon, lat, slice_of))
+
+
+class SpatialIndex:
+    """Packed R-tree over (lat, lon). query() returns matching row ids in ascending order."""
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, node_size: int = NODE_SIZE):
+        self.node_size = node_size
+        # Row-ordered coordinates (shared with the caller, not copied) for distance checks
+        self.row_lat = lat
+        self.row_lon = lon
+        self.order = _str_order(lat, lon, node_size)
+        self.lat = lat[self.order]
+        self.lon = lon[self.order]
+        # levels[0] boxes group node_size points, levels[i] group node_size boxes of levels[i - 1]
+        self.levels: list[tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = []
+        boxes = (self.lat, self.lat, self.lon, self.lon)
+        while len(boxes[0]) and (len(boxes[0]) > 1 or not self.levels):
+            starts = np.arange(0, len(boxes[0]), node_size)
+            boxes = (
+                np.minimum.reduceat(boxes[0], starts),
+                np.maximum.reduceat(boxes[1], starts),
+                np.minimum.reduceat(boxes[2], starts),
+                np.maximum.reduceat(boxes[3], starts),
+            )
+            self.levels.append(boxes)
+
+    @classmethod
+    def from_arrays(
+        cls,
+        lat: np.ndarray,
+        lon: np.ndarray,
+        order: np.ndarray,
+        sorted_lat: np.ndarray,
+        sorted_lon: np.ndarray,
+        levels: list[tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]],
+        node_size: int = NODE_SIZE,
+    ) -> "SpatialIndex":
+        """An index built earlier (e.g. read from a snapshot): the arrays __init__ computes, taken as-is."""
+        index = cls.__new__(cls)
+        index.node_size = node_size
+        index.row_lat = lat
+        index.row_lon = lon
+        index.order = order
+        index.lat = sorted_lat
+        index.lon = sorted_lon
+        index.levels = levels
+        return index
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    @property
+    def nbytes(self) -> int:
+        return self.order.nbytes + self.lat.nbytes + self.lon.nbytes + sum(
+            a.nbytes for boxes in self.levels for a in boxes
+        )
+
+    def query(self, bbox: tuple[float, float, float, float]) -> np.ndarray:
+        """Row ids (ascending) with lat_min <= lat <= lat_max and lon_min <= lon <= lon_max."""
+        n = len(self.order)
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+        lat_min, lat_max, lon_min, lon_max = bbox
+        covered: list[np.ndarray] = []  # point positions under fully contained nodes
+        nodes = np.arange(len(self.levels[-1][0]))
+        for depth in range(len(self.levels) - 1, -1, -1):
+            b_lat_min, b_lat_max, b_lon_min, b_lon_max = (a[nodes] for a in self.levels[depth])
+            hit = (b_lat_max >= lat_min) & (b_lat_min <= lat_max) & (b_lon_max >= lon_min) & (b_lon_min <= lon_max)
+            inside = hit & (b_lat_min >= lat_min) & (b_lat_max <= lat_max) & (b_lon_min >= lon_min) & (b_lon_max <= lon_max)
+            # A node at this depth spans node_size ** (depth + 1) consecutive points
+            span = self.node_size ** (depth + 1)
+            full = nodes[inside]
+            if full.size:
+                covered.append(_expand(full * span, np.minimum((full + 1) * span, n)))
+            partial = nodes[hit & ~inside]
+            child_count = len(self.levels[depth - 1][0]) if depth else n
+            nodes = _expand(partial * self.node_size, np.minimum((partial + 1) * self.node_size, child_count))
+            if not nodes.size:
+                break
+        else:
+            keep = (
+                (self.lat[nodes] >= lat_min) & (self.lat[nodes] <= lat_max)
+                & (self.lon[nodes] >= lon_min) & (self.lon[nodes] <= lon_max)
+            )
+            covered.append(nodes[keep])
+        if not covered:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(self.order[np.concatenate(covered)])
+
+    def nearest(
+        self, lat: float, lon: float, k: int, max_meters: float | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Row ids of the k entrances closest to (lat, lon) by haversine distance, and their
+        distances in meters, nearest first. Only looks at rows inside a growing search
+        circle, so the cost depends on local density rather than the dataset size.
+        """
+        cap = math.pi * EARTH_RADIUS_M if max_meters is None else float(max_meters)
+        radius = min(NEAREST_START_M, cap)
+        while True:
+            ids = self.query(radius_bbox(lat, lon, radius))
+            dist = haversine_m(lat, lon, self.row_lat[ids], self.row_lon[ids])
+            inside = dist <= radius
+            if inside.sum() >= k or radius >= cap:
+                break
+            radius = min(radius * 4, cap)
+        ids, dist = ids[inside], dist[inside]
+        best = np.lexsort((ids, dist))[:k]
+        return ids[best], dist[best]
@@ -0,0 +1,576 @@
+"""
+In-memory entrance store.
+Loads bounding.txt and every agency CSV in data/entrances/ once, so the search
+functions in entrances.py never re-read the files per request.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable
+
+import numpy as np
+
+from names import NameIndex
+from snapshot import SnapshotError, read_snapshot, write_snapshot
+from spatial import SpatialIndex
+
+# pandas is only needed to parse the CSVs: workers that open a snapshot never import it
+if TYPE_CHECKING:
+    import pandas as pd
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data" / "entrances"
+BOUNDING_FILE = DATA_DIR / "bounding.txt"
+
+# Default: no bbox (search all sources). Order: lat_min, lat_max, lon_min, lon_max.
+DEFAULT_BBOX = (float("-inf"), float("inf"), float("-inf"), float("inf"))
+
+# How often (seconds) get_store() stats the data files for changes; negative disables the check
+DATA_CHECK_SECONDS = float(os.environ.get("ENTRANCES_DATA_CHECK_SECONDS", "2"))
+# Poll interval (seconds) of the API's background data watcher; 0 disables it
+WATCH_SECONDS = float(os.environ.get("ENTRANCES_WATCH_SECONDS", "0"))
+# Compiled copy of the CSVs (scripts/build_snapshot.py), used while it matches them.
+# ENTRANCES_SNAPSHOT points workers at a snapshot built elsewhere, e.g. in /dev/shm by scripts/serve.py.
+SNAPSHOT_NAME = "entrances.snap"
+SNAPSHOT_PATH = Path(os.environ["ENTRANCES_SNAPSHOT"]) if os.environ.get("ENTRANCES_SNAPSHOT") else None
+USE_SNAPSHOT = os.environ.get("ENTRANCES_USE_SNAPSHOT", "1") != "0"
+# Bumped whenever the snapshot's arrays or their meaning change; older snapshots are ignored
+SNAPSHOT_FORMAT = 2
+
+
+@dataclass(frozen=True)
+class Agency:
+    """One source listed in bounding.txt. Its entrances are rows [start, stop) of the store."""
+    file: str
+    source: str
+    lat_min: float
+    lat_max: float
+    lon_min: float
+    lon_max: float
+    start: int
+    stop: int
+
+    @property
+    def key(self) -> str:
+        """URL name of the agency: its file name without .txt, lower case (e.g. "cta")."""
+        return self.file.removesuffix(".txt").lower()
+
+    @property
+    def bbox(self) -> tuple[float, float, float, float]:
+        return (self.lat_min, self.lat_max, self.lon_min, self.lon_max)
+
+    def overlaps(self, bbox: tuple[float, float, float, float]) -> bool:
+        return (
+            self.lat_max >= bbox[0]
+            and self.lat_min <= bbox[1]
+            and self.lon_max >= bbox[2]
+            and self.lon_min <= bbox[3]
+        )
+
+
+class EntranceStore:
+    """
+    Columnar entrance data for all agencies, concatenated in bounding.txt order.
+    Station names and uniqueIds are interned: name_id / uid_id index into names / unique_ids.
+    """
+
+    def __init__(
+        self,
+        agencies: list[Agency],
+        lat: np.ndarray,
+        lon: np.ndarray,
+        name_id: np.ndarray,
+        names: list[str],
+        uid_id: np.ndarray,
+        unique_ids: list[str],
+        lat6: np.ndarray | None = None,
+        lon6: np.ndarray | None = None,
+        spatial: SpatialIndex | None = None,
+        name_index: NameIndex | None = None,
+    ):
+        self.agencies = tuple(agencies)
+        self.lat = lat
+        self.lon = lon
+        self.name_id = name_id
+        self.names = names
+        self.uid_id = uid_id
+        self.unique_ids = unique_ids
+        self.load_seconds = 0.0
+        # Set by load_store(): content hash of the files read, and their (name, mtime, size) stat signature
+        self.version = ""
+        self.data_dir: Path | None = None
+        self.signature: tuple = ()
+        # "csv" or "snapshot" (see snapshot.py)
+        self.loaded_from = "csv"
+        # Coordinates as the API returns them. Python's round() is correctly rounded; np.round
+        # is not (it differs in the last digit for ~1% of rows), so this is done once here.
+        if lat6 is None:
+            lat6 = np.fromiter((round(v, 6) for v in lat.tolist()), dtype=np.float64, count=len(lat))
+        if lon6 is None:
+            lon6 = np.fromiter((round(v, 6) for v in lon.tolist()), dtype=np.float64, count=len(lon))
+        self.lat6 = lat6
+        self.lon6 = lon6
+        self._by_file = {a.file: a for a in self.agencies}
+        self._by_key = {a.key: a for a in self.agencies}
+        self._starts = np.array([a.start for a in self.agencies], dtype=np.int64)
+        self.spatial = spatial if spatial is not None else SpatialIndex(lat, lon)
+        self.name_index = name_index if name_index is not None else NameIndex(names)
+        self._agency_station_ids = {a.file: self._first_seen(name_id[a.start:a.stop]) for a in self.agencies}
+        # Structures other modules build from this store (see register_derived)
+        self._derived: dict[str, Any] = {}
+        self._derived_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def derived(self, name: str) -> Any:
+        """The structure registered as name, built from this store on first use and kept with it."""
+        value = self._derived.get(name)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(name)
+                if value is None:
+                    value = self._derived[name] = _derived_builders[name](self)
+        return value
+
+    def agency(self, file_name: str) -> Agency | None:
+        return self._by_file.get(file_name)
+
+    def agency_by_key(self, key: str) -> Agency | None:
+        """The agency for an API name: "cta", "CTA" and "cta.txt" all find cta.txt."""
+        return self._by_key.get(key.lower().removesuffix(".txt"))
+
+    def overlapping(self, bbox: tuple[float, float, float, float]) -> list[Agency]:
+        """Agencies whose bounding box overlaps bbox; all agencies if none do."""
+        matches = [a for a in self.agencies if a.overlaps(bbox)]
+        return matches or list(self.agencies)
+
+    def query_bbox(self, bbox: tuple[float, float, float, float]) -> np.ndarray:
+        """Row indices (ascending) of entrances from any agency inside bbox, bounds inclusive."""
+        return self.spatial.query(bbox)
+
+    def agency_rows(self, rows: np.ndarray, agency: Agency) -> np.ndarray:
+        """The part of an ascending row array that belongs to agency."""
+        lo, hi = np.searchsorted(rows, (agency.start, agency.stop))
+        return rows[lo:hi]
+
+    def agency_of(self, rows: np.ndarray) -> np.ndarray:
+        """Index into self.agencies for each row."""
+        return np.searchsorted(self._starts, rows, side="right") - 1
+
+    def rows_in_bbox(self, agency: Agency, bbox: tuple[float, float, float, float]) -> np.ndarray:
+        """Row indices (ascending) of agency entrances inside bbox, bounds inclusive."""
+        return self.agency_rows(self.query_bbox(bbox), agency)
+
+    @staticmethod
+    def _first_seen(ids: np.ndarray) -> np.ndarray:
+        unique, first = np.unique(ids, return_index=True)
+        return unique[np.argsort(first, kind="stable")]
+
+    def agency_station_ids(self, agency: Agency) -> np.ndarray:
+        """Distinct name ids of all the agency's entrances, in order of first appearance."""
+        return self._agency_station_ids[agency.file]
+
+    def station_ids(self, rows: np.ndarray, agency: Agency | None = None) -> np.ndarray:
+        """Distinct name ids among rows, in order of first appearance."""
+        if agency is not None and len(rows) == agency.stop - agency.start:
+            # Every row of the agency is selected: reuse the ids computed at load time
+            return self._agency_station_ids[agency.file]
+        return self._first_seen(self.name_id[rows])
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.lat, self.lon, self.lat6, self.lon6, self.name_id, self.uid_id)
+        strings = sum(sys.getsizeof(s) for s in self.names) + sum(sys.getsizeof(s) for s in self.unique_ids)
+        return sum(a.nbytes for a in arrays) + strings + self.spatial.nbytes + self.name_index.nbytes
+
+    def data_changed(self) -> bool:
+        """True if bounding.txt or any file it listed changed on disk since this store was loaded."""
+        if self.data_dir is None:
+            return False
+        file_names = [entry[0] for entry in self.signature[1:]]
+        return data_signature(self.data_dir, file_names) != self.signature
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "agencies": len(self.agencies),
+            "entrances": len(self),
+            "stations": len(self.names),
+            "loadedFrom": self.loaded_from,
+            "loadMs": round(self.load_seconds * 1000, 3),
+            "memoryBytes": self.nbytes,
+        }
+
+
+def _read_bounding(data_dir: Path) -> pd.DataFrame | None:
+    import pandas as pd
+
+    bounding_file = data_dir / "bounding.txt"
+    if not bounding_file.exists():
+        return None
+    sources_df = pd.read_csv(bounding_file)
+    # Handle optional leading empty column in bounding.txt
+    if "file" not in sources_df.columns and len(sources_df.columns) >= 2:
+        sources_df = pd.read_csv(bounding_file, index_col=0)
+    return sources_df
+
+
+def _read_agency_csv(csv_path: Path) -> pd.DataFrame | None:
+    import pandas as pd
+
+    try:
+        source_csv = pd.read_csv(csv_path)
+    except Exception:
+        return None
+    if "stationName" not in source_csv.columns or "lat" not in source_csv.columns or "lon" not in source_csv.columns:
+        return None
+    # Rows without a name or coordinates can never match a query or a bbox
+    source_csv = source_csv.dropna(subset=["stationName", "lat", "lon"])
+    unique_ids = source_csv["uniqueId"] if "uniqueId" in source_csv.columns else pd.Series("", index=source_csv.index)
+    return pd.DataFrame({
+        "stationName": source_csv["stationName"].astype(str).str.strip(),
+        "uniqueId": unique_ids.fillna("").astype(str).str.strip(),
+        "lat": source_csv["lat"].astype("float64"),
+        "lon": source_csv["lon"].astype("float64"),
+    })
+
+
+def _listed_files(sources_df: pd.DataFrame | None) -> list[str]:
+    if sources_df is None:
+        return []
+    return [f for f in sources_df["file"] if isinstance(f, str) and f.endswith(".txt")]
+
+
+def data_signature(data_dir: Path, file_names: list[str]) -> tuple:
+    """Cheap change detector: (name, mtime_ns, size) of bounding.txt and each listed file."""
+    signature = []
+    for file_name in ["bounding.txt", *file_names]:
+        try:
+            st = (data_dir / file_name).stat()
+            signature.append((file_name, st.st_mtime_ns, st.st_size))
+        except OSError:
+            signature.append((file_name, None, None))
+    return tuple(signature)
+
+
+def _content_hash(data_dir: Path, file_names: list[str]) -> str:
+    digest = hashlib.sha1()
+    for file_name in ["bounding.txt", *file_names]:
+        path = data_dir / file_name
+        digest.update(file_name.encode())
+        if path.exists():
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def load_store(data_dir: Path = DATA_DIR) -> EntranceStore:
+    """Parse bounding.txt and each agency CSV it lists into one EntranceStore."""
+    import pandas as pd
+
+    started = time.perf_counter()
+    sources_df = _read_bounding(data_dir)
+    file_names = _listed_files(sources_df)
+    # Stat before reading, so a file replaced mid-load shows up as a change on the next check
+    signature = data_signature(data_dir, file_names)
+    agencies: list[Agency] = []
+    frames: list[pd.DataFrame] = []
+    offset = 0
+    if sources_df is not None:
+        for _, row in sources_df.iterrows():
+            file_name = row["file"]
+            if not isinstance(file_name, str) or not file_name.endswith(".txt"):
+                continue
+            csv_path = data_dir / file_name
+            if not csv_path.exists():
+                continue
+            frame = _read_agency_csv(csv_path)
+            if frame is None:
+                continue
+            agencies.append(Agency(
+                file=file_name,
+                source=file_name.replace(".txt", "").upper(),
+                lat_min=float(row["latMin"]),
+                lat_max=float(row["latMax"]),
+                lon_min=float(row["lonMin"]),
+                lon_max=float(row["lonMax"]),
+                start=offset,
+                stop=offset + len(frame),
+            ))
+            frames.append(frame)
+            offset += len(frame)
+
+    if frames:
+        combined = pd.concat(frames, ignore_index=True)
+    else:
+        combined = pd.DataFrame({"stationName": [], "uniqueId": [], "lat": [], "lon": []})
+    name_codes, name_table = pd.factorize(combined["stationName"])
+    uid_codes, uid_table = pd.factorize(combined["uniqueId"])
+    store = EntranceStore(
+        agencies=agencies,
+        lat=combined["lat"].to_numpy(dtype=np.float64),
+        lon=combined["lon"].to_numpy(dtype=np.float64),
+        name_id=name_codes.astype(np.int32),
+        names=[str(s) for s in name_table],
+        uid_id=uid_codes.astype(np.int32),
+        unique_ids=[str(s) for s in uid_table],
+    )
+    store.version = _content_hash(data_dir, file_names)
+    store.data_dir = data_dir
+    store.signature = signature
+    store.load_seconds = time.perf_counter() - started
+    return store
+
+
+def _pack_strings(strings: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """One UTF-8 blob plus character offsets: strings[i] == blob.decode()[offsets[i]:offsets[i + 1]]."""
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    np.cumsum([len(x) for x in strings], out=offsets[1:])
+    return np.frombuffer("".join(strings).encode("utf-8"), dtype=np.uint8), offsets
+
+
+def _unpack_strings(blob: np.ndarray, offsets: np.ndarray) -> list[str]:
+    text = blob.tobytes().decode("utf-8")
+    bounds = offsets.tolist()
+    return [text[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+def save_snapshot(store: EntranceStore, path: Path) -> None:
+    """Write store, including its spatial and name indexes, as a snapshot at path."""
+    names_blob, names_offsets = _pack_strings(store.names)
+    uids_blob, uids_offsets = _pack_strings(store.unique_ids)
+    keys_blob, keys_offsets = _pack_strings(store.name_index.keys)
+    arrays = {
+        "lat": store.lat,
+        "lon": store.lon,
+        "lat6": store.lat6,
+        "lon6": store.lon6,
+        "name_id": store.name_id,
+        "uid_id": store.uid_id,
+        "names_blob": names_blob,
+        "names_offsets": names_offsets,
+        "uids_blob": uids_blob,
+        "uids_offsets": uids_offsets,
+        "keys_blob": keys_blob,
+        "keys_offsets": keys_offsets,
+        "spatial_order": store.spatial.order,
+        "spatial_lat": store.spatial.lat,
+        "spatial_lon": store.spatial.lon,
+        "name_counts": store.name_index.counts,
+        "name_lengths": store.name_index.lengths,
+    }
+    for depth, boxes in enumerate(store.spatial.levels):
+        for j, bound in enumerate(boxes):
+            arrays[f"spatial_level{depth}_{j}"] = bound
+    header = {
+        "format": SNAPSHOT_FORMAT,
+        "version": store.version,
+        "signature": [list(entry) for entry in store.signature],
+        "agencies": [asdict(a) for a in store.agencies],
+        "nodeSize": store.spatial.node_size,
+        "levels": len(store.spatial.levels),
+        "alphabet": "".join(sorted(store.name_index.alphabet, key=store.name_index.alphabet.get)),
+    }
+    write_snapshot(path, header, arrays)
+
+
+def load_snapshot(data_dir: Path = DATA_DIR, path: Path | None = None) -> EntranceStore | None:
+    """
+    The store from data_dir's snapshot, memory-mapped, or None if there is no snapshot or
+    it was built from different files (the CSVs are the source of truth) or in an older
+    SNAPSHOT_FORMAT.
+    """
+    started = time.perf_counter()
+    path = path or SNAPSHOT_PATH or data_dir / SNAPSHOT_NAME
+    try:
+        header, arrays = read_snapshot(path)
+    except (OSError, SnapshotError):
+        return None
+    if header.get("format") != SNAPSHOT_FORMAT:
+        return None
+    signature = tuple(tuple(entry) for entry in header["signature"])
+    current = data_signature(data_dir, [entry[0] for entry in signature[1:]])
+    if current != signature:
+        # Stat data differs (e.g. a fresh checkout): still fresh if the contents are unchanged
+        file_names = _listed_files(_read_bounding(data_dir))
+        if _content_hash(data_dir, file_names) != header["version"]:
+            return None
+        current = data_signature(data_dir, file_names)
+    lat, lon = arrays["lat"], arrays["lon"]
+    names = _unpack_strings(arrays["names_blob"], arrays["names_offsets"])
+    levels = [
+        tuple(arrays[f"spatial_level{depth}_{j}"] for j in range(4))
+        for depth in range(header["levels"])
+    ]
+    store = EntranceStore(
+        agencies=[Agency(**a) for a in header["agencies"]],
+        lat=lat,
+        lon=lon,
+        name_id=arrays["name_id"],
+        names=names,
+        uid_id=arrays["uid_id"],
+        unique_ids=_unpack_strings(arrays["uids_blob"], arrays["uids_offsets"]),
+        lat6=arrays["lat6"],
+        lon6=arrays["lon6"],
+        spatial=SpatialIndex.from_arrays(
+            lat, lon, arrays["spatial_order"], arrays["spatial_lat"], arrays["spatial_lon"], levels, header["nodeSize"]
+        ),
+        name_index=NameIndex.from_arrays(
+            _unpack_strings(arrays["keys_blob"], arrays["keys_offsets"]),
+            header["alphabet"],
+            arrays["name_counts"],
+            arrays["name_lengths"],
+        ),
+    )
+    store.version = header["version"]
+    store.data_dir = data_dir
+    store.signature = current
+    store.loaded_from = "snapshot"
+    store.load_seconds = time.perf_counter() - started
+    return store
+
+
+def open_store(data_dir: Path = DATA_DIR) -> EntranceStore:
+    """load_snapshot() if a current snapshot exists (and ENTRANCES_USE_SNAPSHOT allows it), else load_store()."""
+    store = load_snapshot(data_dir) if USE_SNAPSHOT else None
+    return store if store is not None else load_store(data_dir)
+
+
+# name -> builder of a structure derived from a store (typeahead index, map clusters, ...)
+_derived_builders: dict[str, Callable[[EntranceStore], Any]] = {}
+
+
+def register_derived(name: str, build: Callable[[EntranceStore], Any]) -> None:
+    """
+    Register a per-store structure: store.derived(name) builds it once per store, and reloads
+    build it before the new store is swapped in, so no request waits for it after a reload.
+    """
+    _derived_builders[name] = build
+
+
+def build_derived(store: EntranceStore) -> None:
+    """Build every registered structure of store now."""
+    for name in list(_derived_builders):
+        store.derived(name)
+
+
+_store: EntranceStore | None = None
+_store_lock = threading.Lock()
+_last_check = 0.0
+# Background reload state: at most one reload thread runs at a time
+_reload_thread: threading.Thread | None = None
+_reload_error: str | None = None
+_watcher_stop: threading.Event | None = None
+
+
+def get_store() -> EntranceStore:
+    """
+    Shared store for this process, loaded on first use. At most every DATA_CHECK_SECONDS
+    the data files are stat'ed; if any changed, a background reload starts and callers keep
+    the current store until the new one has been fully built and swapped in.
+    """
+    global _store, _last_check
+    store = _store
+    if store is None:
+        with _store_lock:
+            if _store is None:
+                _store = open_store()
+                _last_check = time.monotonic()
+            return _store
+    now = time.monotonic()
+    if DATA_CHECK_SECONDS >= 0 and now - _last_check >= DATA_CHECK_SECONDS:
+        _last_check = now
+        if store.data_changed():
+            reload_store()
+    return store
+
+
+def _reload(data_dir: Path) -> None:
+    global _store, _reload_error, _last_check
+    try:
+        store = open_store(data_dir)
+        if len(store):
+            build_derived(store)
+    except Exception as exc:  # keep serving the current store
+        _reload_error = f"{type(exc).__name__}: {exc}"
+        return
+    if not len(store):
+        # e.g. bounding.txt caught mid-replace: an empty store would answer every search with nothing
+        _reload_error = f"No entrances loaded from {data_dir}; keeping the current store"
+        return
+    with _store_lock:
+        # One reference assignment: a request holds either the old store or the new one, never a mix
+        _store = store
+        _last_check = time.monotonic()
+    _reload_error = None
+
+
+def reload_store(data_dir: Path | None = None, wait: bool = False) -> bool:
+    """
+    Rebuild the store, its indexes and every registered derived structure from data_dir in a
+    background thread, then swap it in.
+    If loading fails or finds no entrances, the current store stays and reload_status() reports why.
+    Returns False if a reload was already running (that one is waited for if wait is set).
+    """
+    global _reload_thread
+    with _store_lock:
+        running = _reload_thread is not None and _reload_thread.is_alive()
+        if not running:
+            if data_dir is None:
+                data_dir = _store.data_dir if _store is not None and _store.data_dir else DATA_DIR
+            _reload_thread = threading.Thread(target=_reload, args=(data_dir,), name="entrance-store-reload", daemon=True)
+            _reload_thread.start()
+        thread = _reload_thread
+    if wait:
+        thread.join()
+    return not running
+
+
+def reload_status() -> dict:
+    """Whether a reload is running, and the error of the last one if it failed."""
+    thread = _reload_thread
+    return {
+        "reloading": thread is not None and thread.is_alive(),
+        "lastReloadError": _reload_error,
+    }
+
+
+def start_watcher(interval: float) -> None:
+    """
+    Poll the data files every interval seconds from a daemon thread and reload on change,
+    so new files are picked up even while no requests arrive.
+    """
+    global _watcher_stop
+    if interval <= 0 or _watcher_stop is not None:
+        return
+    stop = _watcher_stop = threading.Event()
+
+    def watch():
+        while not stop.wait(interval):
+            store = _store
+            if store is not None and store.data_changed():
+                reload_store()
+
+    threading.Thread(target=watch, name="entrance-data-watcher", daemon=True).start()
+
+
+def stop_watcher() -> None:
+    global _watcher_stop
+    if _watcher_stop is not None:
+        _watcher_stop.set()
+        _watcher_stop = None
+
+
+def init_store(data_dir: Path = DATA_DIR) -> EntranceStore:
+    """Load (or reload) the shared store eagerly, e.g. at API startup."""
+    global _store, _last_check
+    store = open_store(data_dir)
+    with _store_lock:
+        _store = store
+        _last_check = time.monotonic()
+    return store
@@ -0,0 +1,91 @@
+"""
+Typeahead suggestions for GET /api/stations/suggest.
+One entry per distinct (station name, agency) pair, with a precomputed API record. Entry
+keys are normalized names (see normalize.py) in two sorted lists: the full names, and every
+suffix starting at a later word ("times sq 42 st" also under "sq 42 st", "42 st", "st").
+A prefix lookup is a bisect into each list followed by a scan that stops after `limit`
+distinct entries, so it costs the same whether a prefix matches five stations or five
+thousand. Matches at the start of the name come before matches at a later word.
+"""
+from bisect import bisect_left
+
+import numpy as np
+
+from metrics import stage
+from normalize import normalize, word_starts
+from store import EntranceStore, get_store, register_derived
+
+SUGGEST_LIMIT = 10
+SUGGEST_LIMIT_MAX = 50
+
+
+class PrefixIndex:
+    """Sorted (key, entry) lists over a store's station names, plus one API record per entry."""
+
+    def __init__(self, store: EntranceStore):
+        self.records: list[dict] = []
+        names: list[tuple[str, int]] = []
+        words: list[tuple[str, int]] = []
+        for agency in store.agencies:
+            ids = store.name_id[agency.start:agency.stop]
+            if not len(ids):
+                continue
+            unique, first, inverse, counts = np.unique(ids, return_index=True, return_inverse=True, return_counts=True)
+            lat = np.bincount(inverse, weights=store.lat[agency.start:agency.stop]) / counts
+            lon = np.bincount(inverse, weights=store.lon[agency.start:agency.stop]) / counts
+            # Entries in order of first appearance in the agency's file, like the search results
+            for i in np.argsort(first, kind="stable").tolist():
+                name = store.names[int(unique[i])]
+                entry = len(self.records)
+                self.records.append({
+                    "stationName": name,
+                    "source": agency.source,
+                    "entrances": int(counts[i]),
+                    "lat": round(float(lat[i]), 6),
+                    "lon": round(float(lon[i]), 6),
+                })
+                key = normalize(name)
+                names.append((key, entry))
+                words.extend((suffix, entry) for suffix in word_starts(key))
+        names.sort()
+        words.sort()
+        self._name_keys = [key for key, _ in names]
+        self._name_entries = [entry for _, entry in names]
+        self._word_keys = [key for key, _ in words]
+        self._word_entries = [entry for _, entry in words]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def lookup(self, prefix: str, limit: int = SUGGEST_LIMIT) -> list[dict]:
+        """Records of up to limit distinct entries whose name, or a later word of it, starts with prefix."""
+        prefix = normalize(prefix)
+        if not prefix or limit <= 0:
+            return []
+        found: dict[int, None] = {}
+        for keys, entries in ((self._name_keys, self._name_entries), (self._word_keys, self._word_entries)):
+            i = bisect_left(keys, prefix)
+            while i < len(keys) and len(found) < limit and keys[i].startswith(prefix):
+                found.setdefault(entries[i])
+                i += 1
+        return [self.records[entry] for entry in found]
+
+
+register_derived("prefix_index", PrefixIndex)
+
+
+def get_prefix_index(store: EntranceStore) -> PrefixIndex:
+    """The PrefixIndex of store (built with it; see store.register_derived)."""
+    return store.derived("prefix_index")
+
+
+def suggest_stations(prefix: str, limit: int = SUGGEST_LIMIT) -> list[dict]:
+    """
+    Up to limit station suggestions for a typed prefix, across all agencies:
+    { "stationName", "source", "entrances", "lat", "lon" } (lat/lon: centre of the station's entrances).
+    """
+    with stage("store"):
+        store = get_store()
+    index = get_prefix_index(store)
+    with stage("suggest"):
+        return index.lookup(prefix, limit)
@@ -0,0 +1,19 @@
+"""
+Backend tests. The backend modules import each other as top-level modules (they run from
+backend/), so put backend/ on the path; every test runs against data/entrances/.
+
+    cd backend && python -m pytest -q
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from store import get_store
+
+
+@pytest.fixture(scope="session")
+def store():
+    return get_store()
@@ -0,0 +1,77 @@
+import copy
+import random
+
+import pytest
+
+import entrances
+from entrances import BBOX_QUANTUM, get_entrances, get_entrances_cached
+
+QUERIES = ["Union Station", "Metro Center", "Unoin Station", "Oxford", "Chatelet", "zzzzqqq"]
+FIELDS = ("lat_min", "lat_max", "lon_min", "lon_max")
+
+
+@pytest.fixture
+def empty_cache():
+    entrances.search_cache.clear()
+    yield
+    entrances.search_cache.clear()
+
+
+def jittered_bboxes(store, n: int, seed: int = 6):
+    """n random viewports inside agency bounding boxes, from a few hundred metres to ~40 km wide."""
+    rng = random.Random(seed)
+    for _ in range(n):
+        agency = rng.choice(store.agencies)
+        lat = rng.uniform(agency.lat_min, agency.lat_max)
+        lon = rng.uniform(agency.lon_min, agency.lon_max)
+        half = rng.uniform(0.002, 0.2)
+        yield (lat - half, lat + half, lon - half, lon + half)
+
+
+def test_cached_matches_uncached(store, empty_cache):
+    mismatches = []
+    for bbox in jittered_bboxes(store, 40):
+        # Panned by less than a grid cell: may share the first bbox's entry
+        panned = tuple(v + BBOX_QUANTUM * 0.3 for v in bbox)
+        for query in QUERIES:
+            for area in (bbox, panned, bbox):
+                params = dict(zip(FIELDS, area))
+                if get_entrances_cached(query, **params) != get_entrances(query, **params):
+                    mismatches.append((query, area))
+    assert mismatches == []
+
+
+def test_cache_hit_returns_a_copy(empty_cache):
+    first = get_entrances_cached("Union Station")
+    first.clear()
+    assert get_entrances_cached("Union Station") == get_entrances("Union Station")
+
+
+def test_searches_use_the_store_they_are_given(store, monkeypatch, empty_cache):
+    # The endpoint computes its ETag from one store and must search that same store
+    expected = get_entrances("Harvard")
+    ranked = entrances.get_entrances_ranked("Harvard", limit=5)
+    # The cache looks at the served store only when a request's store version is new to it
+    entrances._sync_cache_version()
+
+    def no_store():
+        raise AssertionError("get_store() called although a store was passed")
+
+    monkeypatch.setattr(entrances, "get_store", no_store)
+    assert get_entrances_cached("Harvard", store=store) == expected
+    assert entrances.get_entrances_ranked("Harvard", limit=5, store=store) == ranked
+    assert entrances.get_agency_page("cta", page_size=5, store=store).records()
+
+
+def test_request_on_a_replaced_store_keeps_the_cache(store, empty_cache):
+    # A request still running on the store a reload replaced must not clear the cache of
+    # the new one, nor make the next request on the new one clear it again
+    old = copy.copy(store)
+    old.version = "replaced"
+    get_entrances_cached("Union Station", store=store)
+    assert len(entrances.search_cache) == 1
+    get_entrances_cached("Harvard", store=old)
+    assert entrances._cache_version == store.version
+    hits = entrances.search_cache.hits
+    get_entrances_cached("Union Station", store=store)
+    assert entrances.search_cache.hits == hits + 1
@@ -0,0 +1,34 @@
+import random
+
+import numpy as np
+import pytest
+
+import clusters
+from clusters import get_cluster_index
+
+
+@pytest.mark.parametrize("strip_scan_cells", [clusters.STRIP_SCAN_CELLS, -10**9])
+def test_cells_in_matches_a_full_scan(store, monkeypatch, strip_scan_cells):
+    # -10**9 forces the per-column binary search
+    monkeypatch.setattr(clusters, "STRIP_SCAN_CELLS", strip_scan_cells)
+    rng = random.Random(21)
+    for level in get_cluster_index(store).levels:
+        for _ in range(30):
+            x0, x1 = sorted(rng.randrange(-2, level.side + 2) for _ in range(2))
+            y0, y1 = sorted(rng.randrange(-2, level.side + 2) for _ in range(2))
+            expected = np.flatnonzero((level.x >= x0) & (level.x <= x1) & (level.y >= y0) & (level.y <= y1))
+            assert np.array_equal(level.cells_in(x0, x1, y0, y1), expected)
+
+
+def test_cluster_counts_add_up(store):
+    result = get_cluster_index(store).query((-90, 90, -180, 180), 3)
+    assert sum(c["count"] for c in result["clusters"]) + len(result["entrances"]) == len(store)
+
+
+def test_truncated_points_spread_over_the_viewport(store):
+    # Chicago to New York: file order would return only the first agency's entrances
+    bbox = (40.0, 42.5, -88.5, -73.0)
+    result = get_cluster_index(store).query(bbox, 20, limit=60)
+    assert result["truncated"] and len(result["entrances"]) == 60
+    assert all(bbox[0] <= e["lat"] <= bbox[1] and bbox[2] <= e["lon"] <= bbox[3] for e in result["entrances"])
+    assert {"CTA", "MTA"} <= {e["source"] for e in result["entrances"]}
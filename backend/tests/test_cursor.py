@@ -0,0 +1,37 @@
+import pytest
+
+from entrances import InvalidCursor, decode_cursor, encode_cursor, get_agency_page
+
+
+def test_cursor_round_trip(store):
+    agency = store.agency_by_key("cta")
+    cursor = encode_cursor(store, agency, agency.bbox, 1234)
+    assert decode_cursor(store, agency, agency.bbox, cursor) == 1234
+
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", "bm9jb2xvbnM"])
+def test_malformed_cursor(store, cursor):
+    agency = store.agency_by_key("cta")
+    with pytest.raises(InvalidCursor, match="Malformed"):
+        decode_cursor(store, agency, agency.bbox, cursor)
+
+
+def test_cursor_is_bound_to_agency_and_bbox(store):
+    cta, mta = store.agency_by_key("cta"), store.agency_by_key("mta")
+    cursor = encode_cursor(store, cta, cta.bbox, 10)
+    with pytest.raises(InvalidCursor, match="another agency"):
+        decode_cursor(store, mta, cta.bbox, cursor)
+    with pytest.raises(InvalidCursor, match="bounding box"):
+        decode_cursor(store, cta, (41.8, 41.9, -87.7, -87.6), cursor)
+
+
+def test_pages_cover_the_listing_once(store):
+    everything = get_agency_page("cta").rows.tolist()
+    seen, cursor = [], None
+    while True:
+        page = get_agency_page("cta", cursor=cursor, page_size=100)
+        seen += page.rows.tolist()
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert seen == everything
@@ -0,0 +1,29 @@
+import pytest
+
+from normalize import normalize, search_key, strip_accents, word_starts
+
+
+def test_normalize():
+    assert normalize("St. Paul's") == "st pauls"
+    assert strip_accents("Châtelet–Les Halles") == "Chatelet–Les Halles"
+
+
+@pytest.mark.parametrize("a,b", [
+    ("Times Sq 42 St", "42 Street Times Square"),
+    ("St. Paul's", "Saint Pauls"),
+    ("Ste Catherine", "sainte catherine"),
+    ("Civic Ctr", "Civic Centre"),
+    ("Park Ave", "park avenue"),
+    ("Châtelet", "CHATELET"),
+])
+def test_same_search_key(a, b):
+    assert search_key(a) == search_key(b)
+
+
+def test_single_word_st_is_street():
+    assert search_key("St") == "street"
+
+
+def test_word_starts():
+    assert word_starts("times sq 42") == ["sq 42", "42"]
+    assert word_starts("union") == []
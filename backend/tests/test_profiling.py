@@ -0,0 +1,23 @@
+import pytest
+
+import profiling
+
+
+@pytest.mark.parametrize("values, expected", [
+    (("1",), True),
+    (("true",), True),
+    ((None, " TRUE "), True),
+    (("0",), False),
+    (("false",), False),
+    (("",), False),
+    (("yes",), False),
+    ((None, None), False),
+])
+def test_only_explicit_true_values_request_a_profile(monkeypatch, values, expected):
+    monkeypatch.setattr(profiling, "ENABLED", True)
+    assert profiling.is_requested(*values) is expected
+
+
+def test_requests_are_ignored_unless_enabled(monkeypatch):
+    monkeypatch.setattr(profiling, "ENABLED", False)
+    assert not profiling.is_requested("1", "true")
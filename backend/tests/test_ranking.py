@@ -0,0 +1,20 @@
+import pytest
+
+from entrances import get_entrances_ranked
+
+QUERIES = ["Union Station", "Chatelet", "Metro Centr", "Oxford", "Times Sq-42 St"]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_pages_concatenate_to_the_full_ranking(query):
+    full = get_entrances_ranked(query, limit=40)
+    pages = [get_entrances_ranked(query, limit=4, offset=offset) for offset in range(0, 40, 4)]
+    assert sum(page["stations"] for page in pages) == full["stations"]
+    assert [e for page in pages for e in page["entrances"]] == full["entrances"]
+
+
+def test_exact_matches_do_not_hide_later_pages():
+    first = get_entrances_ranked("Union Station", limit=3)
+    assert first["candidatesScored"] == 0
+    later = get_entrances_ranked("Union Station", limit=3, offset=3)
+    assert later["stations"] == 3
@@ -0,0 +1,33 @@
+import pytest
+
+from entrances import get_entrances, get_entrances_batch, get_entrances_cached, get_entrances_ranked
+
+PARIS_CENTER = {"lat_min": 48.84, "lat_max": 48.88, "lon_min": 2.31, "lon_max": 2.38}
+
+
+@pytest.mark.parametrize("query, bbox", [
+    ("zzzzqqq", {}),
+    ("12345 67890", {}),
+    ("zzzzqqq", PARIS_CENTER),
+])
+def test_no_match_returns_nothing(query, bbox):
+    assert get_entrances(query, **bbox) == []
+    assert get_entrances_cached(query, **bbox) == []
+    assert get_entrances_batch([{"query": query, **bbox}]) == [[]]
+    assert get_entrances_ranked(query, **bbox)["entrances"] == []
+
+
+@pytest.mark.parametrize("query, station", [
+    ("Unoin Station", "Union Station"),
+    ("Metro Centr", "Metro Center"),
+    ("Harvrd", "Harvard"),
+    ("Gare de Lion", "Gare de Lyon"),
+    ("Farragut Nrth", "Farragut North"),
+])
+def test_typos_find_their_station(query, station):
+    assert station in {e["stationName"] for e in get_entrances(query)}
+
+
+def test_accents_and_abbreviations_are_folded():
+    assert get_entrances("Chatelet") == get_entrances("Châtelet")
+    assert get_entrances("7th St/Metro Ctr") == get_entrances("7th Street / Metro Center")
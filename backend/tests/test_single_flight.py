@@ -0,0 +1,180 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlencode
+
+import pytest
+
+import entrances
+from cache import SingleFlight
+from entrances import get_entrances, get_entrances_cached
+from store import get_store
+
+CALLERS = 16
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def run_together(fn, n: int = CALLERS) -> list:
+    """fn() from n threads released at once; their results in thread order."""
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def one(i):
+        barrier.wait()
+        results[i] = fn()
+
+    threads = [threading.Thread(target=one, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+
+def test_concurrent_calls_share_one_computation():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {"answer": 42}
+
+    def call():
+        return flights.do("key", compute)
+
+    threading.Thread(target=lambda: (wait_for(lambda: flights.coalesced == CALLERS - 1), release.set())).start()
+    results = run_together(call)
+    assert len(calls) == 1
+    assert all(value is results[0][0] for value, _ in results)
+    assert sorted(shared for _, shared in results) == [False] + [True] * (CALLERS - 1)
+    assert flights.stats() == {"inFlight": 0, "computed": 1, "coalesced": CALLERS - 1}
+
+
+def test_waiting_callers_get_the_exception():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def compute():
+        release.wait(5)
+        raise ValueError("boom")
+
+    def call():
+        try:
+            flights.do("key", compute)
+        except ValueError as exc:
+            return str(exc)
+
+    threading.Thread(target=lambda: (wait_for(lambda: flights.coalesced == CALLERS - 1), release.set())).start()
+    assert run_together(call) == ["boom"] * CALLERS
+    # Nothing is kept: the next call computes again
+    assert flights.do("key", lambda: 1) == (1, False)
+
+
+def test_identical_searches_run_once(monkeypatch):
+    entrances.search_cache.clear()
+    expected = get_entrances("Union Station")
+    before = entrances.search_flights.coalesced
+    release = threading.Event()
+    calls = []
+    search = entrances._search
+
+    def slow_search(*args):
+        calls.append(args)
+        release.wait(5)
+        return search(*args)
+
+    monkeypatch.setattr(entrances, "_search", slow_search)
+    threading.Thread(
+        target=lambda: (wait_for(lambda: entrances.search_flights.coalesced - before == CALLERS - 1), release.set())
+    ).start()
+    try:
+        results = run_together(lambda: get_entrances_cached("Union Station"))
+    finally:
+        entrances.search_cache.clear()
+    assert len(calls) == 1
+    assert results == [expected] * CALLERS
+
+
+async def asgi_get(app, path: str, query: dict | None = None) -> tuple[int, bytes]:
+    """One GET through the ASGI app: (status, body)."""
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http", "root_path": "",
+        "path": path, "query_string": urlencode(query or {}).encode(), "headers": [(b"host", b"test")],
+        "server": ("test", 80), "client": ("test", 1),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    (start,) = (m for m in messages if m["type"] == "http.response.start")
+    return start["status"], b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body")
+
+
+def coalesced_metric(body: bytes) -> float:
+    for line in body.decode().splitlines():
+        if line.startswith("entrances_searches_coalesced_total "):
+            return float(line.split()[1])
+    return 0.0
+
+
+def test_identical_requests_run_one_search(monkeypatch):
+    import main
+
+    # Serve the store every other test uses instead of loading a new one at startup
+    monkeypatch.setattr(main, "init_store", get_store)
+    release = threading.Event()
+    calls = []
+    search = entrances._search
+
+    def slow_search(*args):
+        calls.append(args)
+        release.wait(5)
+        return search(*args)
+
+    async def burst():
+        async with main.app.router.lifespan_context(main.app):
+            entrances.search_cache.clear()
+            _, metrics = await asgi_get(main.app, "/metrics")
+            before = coalesced_metric(metrics)
+            flights_before = entrances.search_flights.coalesced
+            monkeypatch.setattr(entrances, "_search", slow_search)
+            # The endpoint runs in the threadpool: hold the first search until every other
+            # request has joined it
+            threading.Thread(target=lambda: (
+                wait_for(lambda: entrances.search_flights.coalesced - flights_before == CALLERS - 1), release.set()
+            )).start()
+            responses = await asyncio.gather(
+                *(asgi_get(main.app, "/api/entrances", {"query": "Union Station"}) for _ in range(CALLERS))
+            )
+            monkeypatch.setattr(entrances, "_search", search)
+            entrances.search_cache.clear()
+            lone = await asgi_get(main.app, "/api/entrances", {"query": "Union Station"})
+            _, metrics = await asgi_get(main.app, "/metrics")
+            entrances.search_cache.clear()
+            return responses, lone, coalesced_metric(metrics) - before
+
+    responses, lone, coalesced = asyncio.run(burst())
+    assert len(calls) == 1
+    assert coalesced == CALLERS - 1
+    assert lone[0] == 200
+    assert responses == [lone] * CALLERS
+
+
+@pytest.mark.parametrize("n", [1, 4])
+def test_different_keys_are_not_shared(n):
+    flights = SingleFlight()
+    assert [flights.do(i, lambda i=i: i) for i in range(n)] == [(i, False) for i in range(n)]
+    assert flights.coalesced == 0
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from spatial import SpatialIndex, haversine_m
+
+
+def random_points(n: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    # Rounded so that many points share a coordinate and land on bbox edges
+    return np.round(rng.uniform(40, 42, n), 2), np.round(rng.uniform(-88, -86, n), 2)
+
+
+@pytest.mark.parametrize("node_size", [2, 4, 32])
+def test_query_matches_brute_force(node_size):
+    lat, lon = random_points(3000, node_size)
+    index = SpatialIndex(lat, lon, node_size=node_size)
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        lat_min, lat_max = np.sort(np.round(rng.uniform(39.9, 42.1, 2), 2))
+        lon_min, lon_max = np.sort(np.round(rng.uniform(-88.1, -85.9, 2), 2))
+        expected = np.flatnonzero((lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max))
+        assert np.array_equal(index.query((lat_min, lat_max, lon_min, lon_max)), expected)
+
+
+def test_query_edges():
+    lat, lon = random_points(500, 1)
+    index = SpatialIndex(lat, lon, node_size=4)
+    # Bounds are inclusive: a degenerate bbox on a point returns it
+    assert 7 in index.query((lat[7], lat[7], lon[7], lon[7])).tolist()
+    assert np.array_equal(index.query((-90, 90, -180, 180)), np.arange(500))
+    assert index.query((42, 40, -88, -86)).size == 0  # inverted
+    assert index.query((10, 20, 10, 20)).size == 0
+    assert SpatialIndex(np.empty(0), np.empty(0)).query((-90, 90, -180, 180)).size == 0
+
+
+@pytest.mark.parametrize("k,max_meters", [(1, None), (10, None), (50, 5000.0)])
+def test_nearest_matches_brute_force(k, max_meters):
+    lat, lon = random_points(2000, 3)
+    index = SpatialIndex(lat, lon, node_size=8)
+    rng = np.random.default_rng(k)
+    for _ in range(50):
+        here = (rng.uniform(40, 42), rng.uniform(-88, -86))
+        dist = haversine_m(*here, lat, lon)
+        expected = np.lexsort((np.arange(len(lat)), dist))
+        if max_meters is not None:
+            expected = expected[dist[expected] <= max_meters]
+        ids, found = index.nearest(*here, k, max_meters)
+        assert np.array_equal(ids, expected[:k])
+        assert np.allclose(found, dist[expected[:k]])
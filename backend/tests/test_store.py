@@ -0,0 +1,26 @@
+import shutil
+
+import clusters, compact, suggest  # noqa: F401 -- register their per-store structures
+from store import DATA_DIR, get_store, reload_status, reload_store
+
+
+def test_reload_keeps_store_when_data_is_missing(store, tmp_path):
+    # No bounding.txt: the load finds no entrances
+    assert reload_store(tmp_path, wait=True)
+    assert get_store() is store
+    assert "No entrances loaded" in reload_status()["lastReloadError"]
+
+
+def test_reload_swaps_in_new_data_with_derived_structures(store, tmp_path):
+    for path in DATA_DIR.glob("*.txt"):
+        shutil.copy(path, tmp_path)
+    try:
+        reload_store(tmp_path, wait=True)
+        reloaded = get_store()
+        assert reloaded is not store
+        assert reloaded.version == store.version and len(reloaded) == len(store)
+        assert reload_status()["lastReloadError"] is None
+        # Built before the swap, not by the first request that needs them
+        assert {"prefix_index", "cluster_index", "compact_payloads"} <= set(reloaded._derived)
+    finally:
+        reload_store(DATA_DIR, wait=True)
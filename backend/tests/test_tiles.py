@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from spatial import mercator
+from tiles import BUFFER, EXTENT, LAYER_NAME, InvalidTile, occupied_tiles, render_tile
+
+
+def _varint(data: bytes, i: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[i]
+        i += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, i
+
+
+def _fields(data: bytes) -> list[tuple[int, object]]:
+    i, out = 0, []
+    while i < len(data):
+        key, i = _varint(data, i)
+        if key & 7 == 0:
+            value, i = _varint(data, i)
+        else:
+            assert key & 7 == 2
+            length, i = _varint(data, i)
+            value, i = data[i:i + length], i + length
+        out.append((key >> 3, value))
+    return out
+
+
+def _packed(data: bytes) -> list[int]:
+    i, out = 0, []
+    while i < len(data):
+        value, i = _varint(data, i)
+        out.append(value)
+    return out
+
+
+def _unzigzag(n: int) -> int:
+    return (n >> 1) ^ -(n & 1)
+
+
+def decode(tile: bytes) -> list[dict]:
+    """The layers of an MVT tile, with features as (x, y, properties)."""
+    layers = []
+    for tag, data in _fields(tile):
+        assert tag == 3
+        layer = {"features": [], "keys": [], "values": []}
+        for field, value in _fields(data):
+            if field == 1:
+                layer["name"] = value.decode()
+            elif field == 2:
+                layer["features"].append(value)
+            elif field == 3:
+                layer["keys"].append(value.decode())
+            elif field == 4:
+                (kind, v), = _fields(value)
+                layer["values"].append(v.decode() if kind == 1 else v)
+            elif field == 5:
+                layer["extent"] = value
+            elif field == 15:
+                layer["version"] = value
+        features = []
+        for data in layer["features"]:
+            feature = dict(_fields(data))
+            tags, geometry = _packed(feature[2]), _packed(feature[4])
+            assert feature[3] == 1 and geometry[0] == 9  # one POINT, MoveTo(1)
+            props = {layer["keys"][tags[i]]: layer["values"][tags[i + 1]] for i in range(0, len(tags), 2)}
+            features.append((_unzigzag(geometry[1]), _unzigzag(geometry[2]), props))
+        layer["features"] = features
+        layers.append(layer)
+    return layers
+
+
+def rows_in_tile(store, z: int, x: int, y: int) -> np.ndarray:
+    n = 1 << z
+    mx, my = mercator(store.lat, store.lon)
+    px, py = np.floor((mx * n - x) * EXTENT), np.floor((my * n - y) * EXTENT)
+    return np.flatnonzero((px >= -BUFFER) & (px < EXTENT + BUFFER) & (py >= -BUFFER) & (py < EXTENT + BUFFER))
+
+
+@pytest.mark.parametrize("z", [0, 4, 10, 15])
+def test_tile_holds_every_entrance_in_it(store, z):
+    for x, y in occupied_tiles(store, z)[:5]:
+        (layer,) = decode(render_tile(store, z, x, y))
+        assert (layer["name"], layer["extent"], layer["version"]) == (LAYER_NAME, EXTENT, 2)
+        rows = rows_in_tile(store, z, x, y)
+        assert sum(props["entrances"] for _, _, props in layer["features"]) == len(rows)
+        assert {props["stationName"] for _, _, props in layer["features"]} == {store.names[i] for i in store.name_id[rows].tolist()}
+        sources = {agency.source for agency in store.agencies}
+        for cx, cy, props in layer["features"]:
+            assert -BUFFER <= cx < EXTENT + BUFFER and -BUFFER <= cy < EXTENT + BUFFER
+            assert props["source"] in sources
+
+
+def test_empty_tile(store):
+    # Zoom 10 tile in the middle of the South Pacific
+    assert render_tile(store, 10, 10, 600) == b""
+
+
+@pytest.mark.parametrize("z,x,y", [(-1, 0, 0), (23, 0, 0), (2, 4, 0), (2, 0, -1)])
+def test_invalid_tile(store, z, x, y):
+    with pytest.raises(InvalidTile):
+        render_tile(store, z, x, y)
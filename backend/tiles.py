@@ -0,0 +1,191 @@
+"""
+Mapbox Vector Tiles for GET /api/tiles/{z}/{x}/{y}.
+A tile is rendered from the in-memory store: one R-tree query for the tile's bbox (plus a
+small buffer so symbols at tile edges are not clipped), entrances projected to the tile's
+EXTENT x EXTENT grid, and entrances of the same station and agency that land on the same
+grid cell merged into one point feature with an `entrances` count. Features go into a single
+"entrances" layer with stationName, source and entrances properties.
+
+The MVT 2.1 protobuf is written by hand (a point layer only needs varints and
+length-delimited fields), so no protobuf or mapbox-vector-tile dependency is needed.
+
+Rendered tiles are memoized in tile_cache, keyed by store version. With ENTRANCES_TILE_DIR
+set, tiles pre-rendered by scripts/prerender_tiles.py are read from
+<dir>/<store version>/<z>/<x>/<y>.mvt before anything is rendered.
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+
+from cache import LRUCache
+from metrics import stage
+from spatial import mercator, tile_bbox
+from store import EntranceStore, get_store
+
+MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+LAYER_NAME = "entrances"
+# Tile grid resolution and the margin (in grid units) of neighbouring tiles' points included
+EXTENT = 4096
+BUFFER = 64
+MAX_ZOOM = 22
+
+# Rendered tile cache (see get_tile)
+TILE_CACHE_SIZE = int(os.environ.get("ENTRANCES_TILE_CACHE_SIZE", "2048"))
+TILE_CACHE_MAX_BYTES = int(os.environ.get("ENTRANCES_TILE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Directory of pre-rendered tiles (scripts/prerender_tiles.py); unset = render everything on demand
+TILE_DIR = Path(os.environ["ENTRANCES_TILE_DIR"]) if os.environ.get("ENTRANCES_TILE_DIR") else None
+# Cache-Control max-age of tile responses. Tiles change only when the data does; clients that
+# must see a reload at once add ?v=<store version from /health> to the tile URL.
+TILE_MAX_AGE = int(os.environ.get("ENTRANCES_TILE_MAX_AGE", "86400"))
+
+tile_cache = LRUCache(TILE_CACHE_SIZE, None, TILE_CACHE_MAX_BYTES)
+
+_KEYS = ("stationName", "source", "entrances")
+# MoveTo, one point
+_MOVE_TO_1 = 9
+
+
+class InvalidTile(ValueError):
+    """z/x/y is not a tile: zoom out of range or x/y outside the zoom's grid."""
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _field(tag: int, payload: bytes) -> bytes:
+    """A length-delimited field; tag is the precomputed (field number << 3) | 2."""
+    return bytes((tag,)) + _varint(len(payload)) + payload
+
+
+def _packed(tag: int, values: list[int]) -> bytes:
+    return _field(tag, b"".join(_varint(v) for v in values))
+
+
+def _string_value(text: str) -> bytes:
+    # Value.string_value = 1
+    return _field(0x0A, text.encode("utf-8"))
+
+
+def _uint_value(value: int) -> bytes:
+    # Value.uint_value = 5
+    return b"\x28" + _varint(value)
+
+
+def _validate(z: int, x: int, y: int) -> None:
+    if not 0 <= z <= MAX_ZOOM:
+        raise InvalidTile(f"Zoom must be between 0 and {MAX_ZOOM}")
+    n = 1 << z
+    if not (0 <= x < n and 0 <= y < n):
+        raise InvalidTile(f"Tile {z}/{x}/{y} is outside the zoom {z} grid (0..{n - 1})")
+
+
+def render_tile(store: EntranceStore, z: int, x: int, y: int) -> bytes:
+    """The MVT bytes of tile z/x/y, b"" when no entrance falls in it (buffer included)."""
+    _validate(z, x, y)
+    with stage("bbox"):
+        rows = store.query_bbox(tile_bbox(z, x, y, BUFFER / EXTENT))
+    if not len(rows):
+        return b""
+    with stage("tile"):
+        n = 1 << z
+        mx, my = mercator(store.lat[rows], store.lon[rows])
+        px = np.floor((mx * n - x) * EXTENT).astype(np.int64)
+        py = np.floor((my * n - y) * EXTENT).astype(np.int64)
+        inside = (px >= -BUFFER) & (px < EXTENT + BUFFER) & (py >= -BUFFER) & (py < EXTENT + BUFFER)
+        rows, px, py = rows[inside], px[inside], py[inside]
+        if not len(rows):
+            return b""
+        # One feature per (cell, station, agency), in row order like every other listing
+        order = np.argsort(rows, kind="stable")
+        rows, px, py = rows[order], px[order], py[order]
+        agency_idx = store.agency_of(rows)
+        groups = np.stack([px, py, store.name_id[rows].astype(np.int64), agency_idx.astype(np.int64)], axis=1)
+        _, first, counts = np.unique(groups, axis=0, return_index=True, return_counts=True)
+        keep = np.argsort(first, kind="stable")
+        first, counts = first[keep], counts[keep]
+
+        values: dict[tuple[int, object], int] = {}
+        encoded_values: list[bytes] = []
+
+        def value_index(kind: int, value: object, encoded) -> int:
+            index = values.get((kind, value))
+            if index is None:
+                index = values[(kind, value)] = len(encoded_values)
+                encoded_values.append(_field(0x22, encoded(value)))
+            return index
+
+        names = store.names
+        sources = [agency.source for agency in store.agencies]
+        features = []
+        for name_id, a, cx, cy, count in zip(
+            groups[first, 2].tolist(), groups[first, 3].tolist(), px[first].tolist(), py[first].tolist(), counts.tolist()
+        ):
+            tags = [
+                0, value_index(0, names[name_id], _string_value),
+                1, value_index(0, sources[a], _string_value),
+                2, value_index(1, count, _uint_value),
+            ]
+            # Feature: tags = 2 (packed), type = 3 (POINT = 1), geometry = 4 (packed)
+            feature = _packed(0x12, tags) + b"\x18\x01" + _packed(0x22, [_MOVE_TO_1, _zigzag(cx), _zigzag(cy)])
+            features.append(_field(0x12, feature))
+
+        # Layer: version = 15, name = 1, features = 2, keys = 3, values = 4, extent = 5
+        layer = b"".join([
+            b"\x78\x02",
+            _field(0x0A, LAYER_NAME.encode()),
+            *features,
+            *(_field(0x1A, key.encode()) for key in _KEYS),
+            *encoded_values,
+            b"\x28" + _varint(EXTENT),
+        ])
+        # Tile: layers = 3
+        return _field(0x1A, layer)
+
+
+def tile_path(root: Path, version: str, z: int, x: int, y: int) -> Path:
+    """Where a pre-rendered tile of a store version lives under root."""
+    return root / version / str(z) / str(x) / f"{y}.mvt"
+
+
+def get_tile(z: int, x: int, y: int) -> tuple[str, bytes]:
+    """
+    (store version, MVT bytes) of tile z/x/y from the tile cache, the pre-rendered tile
+    directory or a fresh render, in that order. Empty tiles are b"" and cached like any other.
+    Raises InvalidTile for coordinates outside the zoom's grid.
+    """
+    _validate(z, x, y)
+    with stage("store"):
+        store = get_store()
+    key = (store.version, z, x, y)
+    data = tile_cache.get(key)
+    if data is not None:
+        return store.version, data
+    if TILE_DIR is not None:
+        path = tile_path(TILE_DIR, store.version, z, x, y)
+        if path.is_file():
+            data = path.read_bytes()
+    if data is None:
+        data = render_tile(store, z, x, y)
+    tile_cache.put(key, data, len(data) + 64)
+    return store.version, data
+
+
+def occupied_tiles(store: EntranceStore, z: int) -> list[tuple[int, int]]:
+    """The (x, y) of every zoom z tile holding at least one entrance, in x then y order."""
+    n = 1 << z
+    mx, my = mercator(store.lat, store.lon)
+    tx = np.minimum((mx * n).astype(np.int64), n - 1)
+    ty = np.minimum((my * n).astype(np.int64), n - 1)
+    cells = np.unique(tx * n + ty)
+    return list(zip((cells // n).tolist(), (cells % n).tolist()))
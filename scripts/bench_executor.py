@@ -0,0 +1,69 @@
+'''
+Compare the per-agency execution modes of get_entrances: serial, thread pool, process pool.
+
+For each mode, measures
+    1. single-query latency: the query corpus run one query at a time (no bbox, so every
+       agency is searched and the fan-out has ten tasks), and
+    2. concurrent throughput: the same corpus spread over --clients threads, as the API's
+       threadpool would issue it under load,
+and checks every mode returns exactly what serial mode returns.
+
+Example Usage:
+    python scripts/bench_executor.py
+    python scripts/bench_executor.py --workers 4 --clients 8 --repeat 3
+'''
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import entrances
+from entrances import EXECUTOR_MODES, get_entrances, set_executor
+from query_corpus import QUERIES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=0, help="pool size (default: ENTRANCES_WORKERS or min(cpus, 10))")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent callers for the throughput run")
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the corpus per measurement")
+    args = parser.parse_args()
+
+    print(f"cpus: {os.cpu_count()}, queries: {len(QUERIES)}, clients: {args.clients}")
+    expected = None
+    rows = []
+    for mode in EXECUTOR_MODES:
+        set_executor(mode, args.workers or None)
+        # Warm up (starts pool workers and loads their stores) and check parity with serial
+        results = [get_entrances(q) for q in QUERIES]
+        if expected is None:
+            expected = results
+        mismatches = sum(a != b for a, b in zip(results, expected))
+
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for query in QUERIES:
+                get_entrances(query)
+        single_ms = (time.perf_counter() - started) / (args.repeat * len(QUERIES)) * 1000
+
+        with ThreadPoolExecutor(args.clients) as clients:
+            started = time.perf_counter()
+            list(clients.map(get_entrances, QUERIES * args.repeat))
+            elapsed = time.perf_counter() - started
+        throughput = args.repeat * len(QUERIES) / elapsed
+        rows.append((mode, entrances.EXECUTOR_WORKERS if mode != "serial" else 1, single_ms, throughput, mismatches))
+    set_executor("serial")
+
+    print(f"{'mode':<8} {'workers':>7} {'single ms/query':>16} {'concurrent q/s':>15} {'mismatches':>11}")
+    for mode, workers, single_ms, throughput, mismatches in rows:
+        print(f"{mode:<8} {workers:>7} {single_ms:>16.2f} {throughput:>15.1f} {mismatches:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+'''
+Measure the station name index against plain rapidfuzz scoring.
+
+For every query in scripts/query_corpus.py, with no bbox and with each viewport bbox,
+ranks the top-15 station names of every overlapping agency two ways -- process.extract
+with fuzz.ratio over every candidate name, both sides folded by normalize.search_key
+(the original get_entrances loop) vs one NameIndex.prepare() per query plus
+NameQuery.top() per agency -- checks that the rankings are identical, and prints
+per-search timings.
+
+Example Usage:
+    python scripts/bench_name_index.py
+    python scripts/bench_name_index.py --repeat 20
+'''
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from rapidfuzz import process, fuzz
+
+from entrances import MATCH_LIMIT as LIMIT, SCORE_CUTOFF
+from normalize import search_key
+from store import get_store
+from query_corpus import QUERIES, BBOXES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the corpus per method")
+    args = parser.parse_args()
+
+    store = get_store()
+    inf = float("inf")
+    bboxes = [(-inf, inf, -inf, inf)] + list(BBOXES.values())
+    # One search = (query, [(candidate ids, candidate names) per overlapping agency])
+    searches = []
+    for query in QUERIES:
+        for bbox in bboxes:
+            rows_all = store.query_bbox(bbox)
+            per_agency = []
+            for agency in store.overlapping(bbox):
+                rows = store.agency_rows(rows_all, agency)
+                if rows.size:
+                    ids = store.station_ids(rows, agency)
+                    per_agency.append((ids, [store.names[i] for i in ids]))
+            searches.append((query, per_agency))
+
+    def run_extract(query, per_agency):
+        return [
+            [(idx, score) for _, score, idx in process.extract(
+                query, choices, scorer=fuzz.ratio, processor=search_key, limit=LIMIT, score_cutoff=SCORE_CUTOFF)]
+            for _, choices in per_agency
+        ]
+
+    def run_index(query, per_agency):
+        name_query = store.name_index.prepare(query)
+        return [name_query.top(ids, LIMIT, SCORE_CUTOFF) for ids, _ in per_agency]
+
+    mismatches = sum(run_extract(q, pa) != run_index(q, pa) for q, pa in searches)
+
+    timings = {}
+    for label, fn in (("process.extract", run_extract), ("NameIndex", run_index)):
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for query, per_agency in searches:
+                fn(query, per_agency)
+        timings[label] = (time.perf_counter() - started) / (args.repeat * len(searches))
+
+    candidates = sum(len(ids) for _, pa in searches for ids, _ in pa)
+    print(f"{len(QUERIES)} queries x {len(bboxes)} bboxes = {len(searches)} searches, {candidates:,} candidate names")
+    print(f"ranking mismatches: {mismatches}")
+    for label, seconds in timings.items():
+        print(f"{label:<16} {seconds * 1e6:8.1f} us/search")
+    print(f"speedup          {timings['process.extract'] / timings['NameIndex']:8.2f}x")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
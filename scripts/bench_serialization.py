@@ -0,0 +1,84 @@
+'''
+Compare the cost of turning matched rows into an HTTP response body.
+
+    before: one dict per row with round() on each coordinate, then FastAPI's default path
+            (jsonable_encoder walks the payload, then JSONResponse renders it)
+    after:  entrances._records (column-wise, coordinates pre-rounded at load) rendered
+            directly by responses.FastJSONResponse
+
+Checks both produce identical bytes, for the full CTA listing (the largest payload) and
+for every corpus query with no bbox.
+
+Example Usage:
+    python scripts/bench_serialization.py
+    python scripts/bench_serialization.py --repeat 20
+'''
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from entrances import SCORE_CUTOFF, _bbox, _records, _search
+from query_corpus import QUERIES
+from responses import FastJSONResponse
+from store import get_store
+
+
+def render_before(store, rows) -> bytes:
+    agency_of = store.agency_of(rows)
+    records = [
+        {
+            "stationName": store.names[int(store.name_id[row])],
+            "source": store.agencies[int(agency)].source,
+            "lat": round(float(store.lat[row]), 6),
+            "lon": round(float(store.lon[row]), 6),
+        }
+        for row, agency in zip(rows, agency_of)
+    ]
+    return JSONResponse(jsonable_encoder({"entrances": records})).body
+
+
+def render_after(store, rows) -> bytes:
+    return FastJSONResponse({"entrances": _records(store, rows)}).body
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10, help="timed passes per payload")
+    args = parser.parse_args()
+
+    store = get_store()
+    cta = store.agency_by_key("cta")
+    payloads = {"cta (all rows)": store.rows_in_bbox(cta, cta.bbox)}
+    corpus = [_search(store, q, _bbox(None, None, None, None), SCORE_CUTOFF) for q in QUERIES]
+
+    mismatches = sum(render_before(store, rows) != render_after(store, rows) for rows in [*payloads.values(), *corpus])
+
+    print(f"{'payload':<16} {'rows':>7} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for label, rows in payloads.items():
+        before = timed(lambda: render_before(store, rows), args.repeat)
+        after = timed(lambda: render_after(store, rows), args.repeat)
+        print(f"{label:<16} {len(rows):>7} {before:>10.2f} {after:>10.2f} {before / after:>7.1f}x")
+    rows_total = sum(len(rows) for rows in corpus)
+    before = timed(lambda: [render_before(store, rows) for rows in corpus], args.repeat)
+    after = timed(lambda: [render_after(store, rows) for rows in corpus], args.repeat)
+    print(f"{'corpus (total)':<16} {rows_total:>7} {before:>10.2f} {after:>10.2f} {before / after:>7.1f}x")
+    print(f"byte mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
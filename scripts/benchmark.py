@@ -0,0 +1,290 @@
+'''
+Benchmark suite for station search: get_entrances, get_cta_entrances and suggest_stations
+in-process, and /api/entrances and /api/entrances/cta through an in-process ASGI client (no
+network, no server; the full FastAPI request path including validation and serialization).
+
+Every scenario runs the fixed corpus in scripts/query_corpus.py, per query category
+(exact, typo, partial, no_match, accented), once without a bbox and once against each
+of the corpus viewports. The typeahead scenarios type each corpus query one character at a
+time (short: its first 1-3 characters, long: the rest). Each scenario gets a warm-up pass, then --repeat timed passes:
+    - latency percentiles p50 / p95 / p99 (plus mean and max) per call, in ms
+    - throughput: calls per second over the timed passes
+    - peak memory: tracemalloc peak during one extra pass (timed separately, since
+      tracing slows Python down), in KiB
+The HTTP scenarios run with the result cache disabled so they measure the search itself;
+pass --cache to keep it. The http_revalidate scenarios repeat the http_entrances calls with
+the ETag of each first response in If-None-Match: the cost of a 304.
+
+Results are printed and, with --output, saved as JSON together with the environment
+(commit, Python, CPUs, dataset version). --compare prints the change against an earlier
+JSON file.
+
+Example Usage:
+    python scripts/benchmark.py
+    python scripts/benchmark.py --repeat 10 --output bench-after.json --compare bench-before.json
+    python scripts/benchmark.py --only get_cta_entrances http_cta
+'''
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlencode
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import numpy as np
+
+import entrances
+from entrances import get_cta_entrances, get_entrances
+from query_corpus import BBOXES, CATEGORIES
+from store import get_store
+from suggest import suggest_stations
+
+GROUPS = ("get_entrances", "get_cta_entrances", "suggest_stations", "http_entrances", "http_cta", "http_revalidate")
+HTTP_GROUPS = {"http_entrances", "http_cta", "http_revalidate"}
+
+CTA_WINDOWS = {
+    "full": None,
+    "loop": (41.87, 41.89, -87.64, -87.62),
+    "north_side": (41.93, 42.02, -87.72, -87.64),
+    "empty": (0.0, 0.1, 0.0, 0.1),
+}
+# The CTA scenarios are one call each, so they get more passes
+CTA_MIN_REPEAT = 20
+
+
+def _bbox_params(bbox) -> dict:
+    if bbox is None:
+        return {}
+    return dict(zip(("lat_min", "lat_max", "lon_min", "lon_max"), bbox))
+
+
+def _search_calls() -> dict[str, list[dict]]:
+    """Scenario suffix -> keyword arguments for each call: <category>/no_bbox and <category>/bbox."""
+    calls = {}
+    for category, queries in CATEGORIES.items():
+        calls[f"{category}/no_bbox"] = [{"query": q} for q in queries]
+        calls[f"{category}/bbox"] = [{"query": q, **_bbox_params(b)} for q in queries for b in BBOXES.values()]
+    return calls
+
+
+def _suggest_calls() -> dict[str, list[dict]]:
+    """Every prefix of every corpus query, as typed: short (1-3 characters) and long."""
+    prefixes = {q[:n] for queries in CATEGORIES.values() for q in queries for n in range(1, len(q) + 1)}
+    prefixes = sorted(p for p in prefixes if p.strip())
+    return {
+        "short": [{"prefix": p} for p in prefixes if len(p) <= 3],
+        "long": [{"prefix": p} for p in prefixes if len(p) > 3],
+    }
+
+
+def _cta_calls() -> dict[str, list[dict]]:
+    return {name: [_bbox_params(bbox)] for name, bbox in CTA_WINDOWS.items()}
+
+
+async def _asgi_get(app, path: str, params: dict, headers: dict[str, str] | None = None) -> tuple[int, dict, bytes]:
+    """One GET through app's ASGI interface; returns status, response headers (lower-case names) and body."""
+    request_headers = [(b"host", b"benchmark")]
+    request_headers += [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": urlencode(params).encode(), "headers": request_headers,
+        "client": ("127.0.0.1", 0), "server": ("benchmark", 80),
+    }
+    received = False
+    status = 0
+    response_headers = {}
+    body = []
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers.update((k.decode(), v.decode()) for k, v in message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, response_headers, b"".join(body)
+
+
+def _summary(latencies: list[float], elapsed: float, peak_bytes: int) -> dict:
+    ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "calls": len(latencies),
+        "p50Ms": round(float(p50), 4),
+        "p95Ms": round(float(p95), 4),
+        "p99Ms": round(float(p99), 4),
+        "meanMs": round(float(ms.mean()), 4),
+        "maxMs": round(float(ms.max()), 4),
+        "throughputPerSec": round(len(latencies) / elapsed, 1),
+        "peakMemoryKiB": round(peak_bytes / 1024, 1),
+    }
+
+
+def run_sync(fn, calls: list[dict], repeat: int) -> dict:
+    for kwargs in calls:
+        fn(**kwargs)
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for kwargs in calls:
+            t0 = time.perf_counter()
+            fn(**kwargs)
+            latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    for kwargs in calls:
+        fn(**kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return _summary(latencies, elapsed, peak)
+
+
+async def run_http(app, path: str, calls: list[dict], repeat: int, revalidate: bool = False) -> dict:
+    """With revalidate, every timed call sends the ETag of its warm-up response and must get 304."""
+    expected = 304 if revalidate else 200
+    conditions = []
+    for params in calls:
+        status, headers, _ = await _asgi_get(app, path, params)
+        if status != 200:
+            raise RuntimeError(f"GET {path}?{urlencode(params)} returned {status}")
+        conditions.append({"If-None-Match": headers["etag"]} if revalidate else None)
+    status, _, _ = await _asgi_get(app, path, calls[0], conditions[0])
+    if status != expected:
+        raise RuntimeError(f"GET {path}?{urlencode(calls[0])} returned {status}, not {expected}")
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for params, condition in zip(calls, conditions):
+            t0 = time.perf_counter()
+            await _asgi_get(app, path, params, condition)
+            latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    for params, condition in zip(calls, conditions):
+        await _asgi_get(app, path, params, condition)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return _summary(latencies, elapsed, peak)
+
+
+async def _run_http_scenarios(groups: set[str], repeat: int) -> dict:
+    import main
+
+    results = {}
+    async with main.app.router.lifespan_context(main.app):
+        if "http_entrances" in groups:
+            for name, calls in _search_calls().items():
+                results[f"http_entrances/{name}"] = await run_http(main.app, "/api/entrances", calls, repeat)
+        if "http_cta" in groups:
+            for name, calls in _cta_calls().items():
+                results[f"http_cta/{name}"] = await run_http(
+                    main.app, "/api/entrances/cta", calls, max(repeat, CTA_MIN_REPEAT)
+                )
+        if "http_revalidate" in groups:
+            for name, calls in _search_calls().items():
+                results[f"http_revalidate/{name}"] = await run_http(main.app, "/api/entrances", calls, repeat, revalidate=True)
+    return results
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(results: dict, baseline_path: Path) -> None:
+    baseline = json.loads(baseline_path.read_text())["scenarios"]
+    print(f"\nvs {baseline_path} (p50 / throughput, negative p50 change is faster)")
+    for name, row in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        p50 = (row["p50Ms"] / old["p50Ms"] - 1) * 100 if old["p50Ms"] else 0.0
+        rate = (row["throughputPerSec"] / old["throughputPerSec"] - 1) * 100 if old["throughputPerSec"] else 0.0
+        print(f"{name:<34} p50 {p50:+7.1f}%   throughput {rate:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="timed passes per scenario")
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=list(GROUPS), help="scenario groups to run")
+    parser.add_argument("--cache", action="store_true", help="keep the result cache on for the HTTP scenarios")
+    parser.add_argument("--output", type=Path, default=None, help="write results as JSON to this file")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier JSON results to compare against")
+    args = parser.parse_args()
+    groups = set(args.only)
+
+    store = get_store()
+    results = {}
+    if "get_entrances" in groups:
+        for name, calls in _search_calls().items():
+            results[f"get_entrances/{name}"] = run_sync(get_entrances, calls, args.repeat)
+    if "get_cta_entrances" in groups:
+        for name, calls in _cta_calls().items():
+            results[f"get_cta_entrances/{name}"] = run_sync(get_cta_entrances, calls, max(args.repeat, CTA_MIN_REPEAT))
+    if "suggest_stations" in groups:
+        for name, calls in _suggest_calls().items():
+            results[f"suggest_stations/{name}"] = run_sync(suggest_stations, calls, args.repeat)
+    if groups & HTTP_GROUPS:
+        if not args.cache:
+            entrances.search_cache.max_entries = 0
+            entrances.search_cache.clear()
+        results.update(asyncio.run(_run_http_scenarios(groups, args.repeat)))
+
+    print(f"{'scenario':<34} {'calls':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'calls/s':>9} {'peak KiB':>9}")
+    for name, row in results.items():
+        print(
+            f"{name:<34} {row['calls']:>6} {row['p50Ms']:>8.3f} {row['p95Ms']:>8.3f} {row['p99Ms']:>8.3f}"
+            f" {row['throughputPerSec']:>9.1f} {row['peakMemoryKiB']:>9.1f}"
+        )
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    max_rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform == "darwin" else 1)
+
+    if args.output:
+        report = {
+            "createdAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "environment": {
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "executor": entrances.EXECUTOR_MODE,
+                "cache": args.cache,
+                "repeat": args.repeat,
+            },
+            "store": store.stats(),
+            "maxRssKiB": round(max_rss_kib),
+            "scenarios": results,
+        }
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nwrote {args.output}")
+    if args.compare:
+        _compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+'''
+Build the compact per-agency entrance payloads the map loads instead of the agency CSVs.
+
+Reads data/entrances/ (bounding.txt and the CSVs it lists) and writes, per agency,
+<out>/<agency>.vfe in the encoding of backend/compact.py (station name dictionary,
+delta-encoded fixed-point int32 coordinates) plus precompressed <agency>.vfe.gz and, when
+the brotli package is installed, <agency>.vfe.br for static servers that serve those
+directly (nginx gzip_static / brotli_static). Every payload is decoded again and checked
+against the CSV rows. Then prints, per agency, the size of the CSV and of each payload
+variant, and the time to parse the CSV text vs decode the payload.
+
+Rerun after replacing data files (npm run build:data).
+
+Example Usage:
+    python scripts/build_payloads.py
+    python scripts/build_payloads.py --out /tmp/compact --repeat 50
+'''
+import argparse
+import csv
+import gzip
+import io
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+import numpy as np
+
+from compact import build_payloads, decode, fixed_point
+from store import DATA_DIR, load_store
+
+
+def parse_csv(text: str) -> tuple[list[str], list[float], list[float]]:
+    """What the CSV loader in src/lib/transit-data.ts does: find the columns, then parse every line."""
+    rows = csv.reader(io.StringIO(text))
+    header = next(rows)
+    name_col, lat_col, lon_col = header.index("stationName"), header.index("lat"), header.index("lon")
+    names, lats, lons = [], [], []
+    for row in rows:
+        if row:
+            names.append(row[name_col])
+            lats.append(round(float(row[lat_col]) * 1e6) / 1e6)
+            lons.append(round(float(row[lon_col]) * 1e6) / 1e6)
+    return names, lats, lons
+
+
+def best_ms(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help="directory with bounding.txt and the CSVs")
+    parser.add_argument("--out", type=Path, default=ROOT / "public" / "data" / "compact", help="output directory")
+    parser.add_argument("--repeat", type=int, default=20, help="parse timings: best of this many runs")
+    args = parser.parse_args()
+
+    store = load_store(args.data_dir)
+    payloads = build_payloads(store)
+    args.out.mkdir(parents=True, exist_ok=True)
+
+    print(f"{'agency':<12} {'csv':>9} {'csv.gz':>9} {'vfe':>9} {'vfe.gz':>9} {'vfe.br':>9}   {'csv parse':>10} {'vfe decode':>10}")
+    totals = np.zeros(5, dtype=np.int64)
+    mismatches = 0
+    for agency in store.agencies:
+        payload = payloads[agency.key]
+        for suffix, data in ((".vfe", payload.identity), (".vfe.gz", payload.gzip), (".vfe.br", payload.br)):
+            path = args.out / f"{agency.key}{suffix}"
+            if data is None:
+                path.unlink(missing_ok=True)
+            else:
+                path.write_bytes(data)
+
+        decoded = decode(payload.identity)
+        rows = slice(agency.start, agency.stop)
+        names = [decoded["names"][i] for i in decoded["nameId"].tolist()]
+        if (
+            names != [store.names[i] for i in store.name_id[rows].tolist()]
+            or not np.array_equal(decoded["lat"], fixed_point(store.lat[rows]) / 1e6)
+            or not np.array_equal(decoded["lon"], fixed_point(store.lon[rows]) / 1e6)
+        ):
+            mismatches += 1
+            print(f"{agency.key}: decoded payload does not match the CSV rows")
+
+        raw = (args.data_dir / agency.file).read_bytes()
+        sizes = [len(raw), len(gzip.compress(raw, 9)), len(payload.identity), len(payload.gzip), len(payload.br or b"")]
+        totals += sizes
+        text = raw.decode("utf-8")
+        csv_ms = best_ms(lambda: parse_csv(text), args.repeat)
+        vfe_ms = best_ms(lambda: decode(payload.identity), args.repeat)
+        br = f"{sizes[4]:>9,}" if payload.br is not None else f"{'-':>9}"
+        print(f"{agency.key:<12} {sizes[0]:>9,} {sizes[1]:>9,} {sizes[2]:>9,} {sizes[3]:>9,} {br}   {csv_ms:>8.2f}ms {vfe_ms:>8.2f}ms")
+
+    br_total = f"{totals[4]:>9,}" if totals[4] else f"{'-':>9}"
+    print(f"{'total':<12} {totals[0]:>9,} {totals[1]:>9,} {totals[2]:>9,} {totals[3]:>9,} {br_total}")
+    print(f"wrote {len(payloads)} agencies to {args.out}; gzip payloads are {totals[3] / totals[1]:.0%} of gzip CSVs")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
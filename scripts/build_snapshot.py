@@ -0,0 +1,54 @@
+'''
+Compile data/entrances/ (bounding.txt and the agency CSVs it lists) into the binary
+snapshot the backend memory-maps at startup: data/entrances/entrances.snap.
+
+The CSVs stay the source of truth. The backend only uses the snapshot while it matches
+them (same stat signature or same content hash) and parses the CSVs otherwise, so rerun
+this after replacing data files.
+
+Example Usage:
+    python scripts/build_snapshot.py
+    python scripts/build_snapshot.py --data-dir data/entrances --output /tmp/entrances.snap
+'''
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from store import DATA_DIR, SNAPSHOT_NAME, load_snapshot, load_store, save_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help="directory with bounding.txt and the CSVs")
+    parser.add_argument("--output", type=Path, default=None, help=f"snapshot path (default: <data-dir>/{SNAPSHOT_NAME})")
+    args = parser.parse_args()
+    output = args.output or args.data_dir / SNAPSHOT_NAME
+
+    store = load_store(args.data_dir)
+    started = time.perf_counter()
+    save_snapshot(store, output)
+    write_ms = (time.perf_counter() - started) * 1000
+
+    snapshot = load_snapshot(args.data_dir, output)
+    if snapshot is None:
+        sys.exit(f"could not read back {output}")
+    checks = {
+        "coordinates": bool((snapshot.lat == store.lat).all() and (snapshot.lon == store.lon).all()),
+        "names": snapshot.names == store.names and bool((snapshot.name_id == store.name_id).all()),
+        "uniqueIds": snapshot.unique_ids == store.unique_ids and bool((snapshot.uid_id == store.uid_id).all()),
+        "agencies": snapshot.agencies == store.agencies,
+    }
+    print(f"wrote {output} ({output.stat().st_size:,} bytes, version {store.version}) in {write_ms:.1f} ms")
+    print(f"CSV load: {store.load_seconds * 1000:.1f} ms, snapshot open: {snapshot.load_seconds * 1000:.1f} ms")
+    for name, ok in checks.items():
+        print(f"  {name:<12} {'ok' if ok else 'MISMATCH'}")
+    if not all(checks.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
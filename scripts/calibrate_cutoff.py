@@ -0,0 +1,95 @@
+'''
+Report how the fuzzy-match score cutoff trades typo recall against unrelated matches.
+
+For the matching before search keys (token_sort_ratio on the raw names, cutoff 45) and
+for the current matching (fuzz.ratio on folded search keys, see backend/normalize.py) at
+each --cutoffs value, runs every query of scripts/query_corpus.py the way get_entrances
+does (top 15 stations per agency) and counts:
+    typos      typo queries (no bbox) whose intended station (TYPO_TARGETS) is returned
+    partial    stations returned for partial queries (no bbox), and how many of them
+               contain every word of the query
+    misplaced  stations returned for exact and accented queries in viewports that do not
+               contain the station: every one of them is unrelated to the query
+    no_match   stations returned for non-matching queries, over all viewports
+entrances.SCORE_CUTOFF, the cutoff searches use, is marked with *.
+
+Example Usage:
+    python scripts/calibrate_cutoff.py
+    python scripts/calibrate_cutoff.py --cutoffs 45 55 60 65
+'''
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from rapidfuzz import fuzz, process
+
+from entrances import MATCH_LIMIT, SCORE_CUTOFF, _bbox, _search
+from normalize import search_key
+from query_corpus import ACCENTED, BBOXES, EXACT, NO_MATCH, PARTIAL, TYPO_TARGETS
+from store import get_store
+
+NO_BBOX = _bbox(None, None, None, None)
+
+
+def before(store, query: str, bbox) -> set[str]:
+    """Station names get_entrances returned before search keys: token_sort_ratio on raw names, cutoff 45."""
+    in_bbox = store.query_bbox(bbox)
+    found = set()
+    for agency in store.overlapping(bbox):
+        rows = store.agency_rows(in_bbox, agency)
+        if rows.size:
+            names = [store.names[i] for i in store.station_ids(rows, agency).tolist()]
+            found.update(name for name, _, _ in process.extract(
+                query, names, scorer=fuzz.token_sort_ratio, limit=MATCH_LIMIT, score_cutoff=45))
+    return found
+
+
+def current(cutoff: int):
+    def search(store, query: str, bbox) -> set[str]:
+        return {store.names[i] for i in store.name_id[_search(store, query, bbox, cutoff)].tolist()}
+    return search
+
+
+def measure(store, search) -> dict:
+    typos = sum(TYPO_TARGETS[q] in search(store, q, NO_BBOX) for q in TYPO_TARGETS)
+    partial = relevant = 0
+    for query in PARTIAL:
+        words = set(search_key(query).split())
+        for name in search(store, query, NO_BBOX):
+            partial += 1
+            relevant += words <= set(search_key(name).split())
+    misplaced = 0
+    for query in EXACT + ACCENTED:
+        key = search_key(query)
+        for bbox in BBOXES.values():
+            keys = {store.name_index.keys[i] for i in store.name_id[store.query_bbox(bbox)].tolist()}
+            if key not in keys:
+                misplaced += len(search(store, query, bbox))
+    no_match = sum(len(search(store, q, bbox)) for q in NO_MATCH for bbox in [NO_BBOX, *BBOXES.values()])
+    return {"typos": typos, "partial": partial, "relevant": relevant, "misplaced": misplaced, "no_match": no_match}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cutoffs", type=int, nargs="+", default=[45, 50, 55, 60, 65, 70], help="cutoffs to try")
+    args = parser.parse_args()
+
+    store = get_store()
+    print(f"{'matching':<22} {'typos':>7} {'partial (relevant)':>19} {'misplaced':>10} {'no_match':>9}")
+    runs = [("before, cutoff 45", before)] + [
+        (f"keys, cutoff {c}{' *' if c == SCORE_CUTOFF else ''}", current(c)) for c in args.cutoffs
+    ]
+    for label, search in runs:
+        m = measure(store, search)
+        print(
+            f"{label:<22} {m['typos']:>3}/{len(TYPO_TARGETS):<3} {m['partial']:>11} ({m['relevant']:>4}) "
+            f"{m['misplaced']:>10} {m['no_match']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+'''
+Concurrency check for single-flight search coalescing, against a local uvicorn server.
+
+Starts `uvicorn main:app` from backend/ with the result cache disabled (so every request
+would otherwise run its own search), then for each query sends --clients identical
+/api/entrances requests at the same instant from as many threads, each on its own
+connection. Checks that:
+    - every response is 200 and byte-for-byte the response of a later, lone request
+    - the server computed fewer searches than it answered: the difference is the
+      singleFlight "coalesced" counter of /api/admin/cache and
+      entrances_searches_coalesced_total in /metrics
+    - the same number of requests for *different* bboxes are never coalesced
+Exits 1 if any check fails.
+
+Example Usage:
+    python scripts/check_coalescing.py
+    python scripts/check_coalescing.py --clients 32 --rounds 5
+    python scripts/check_coalescing.py --url http://127.0.0.1:8000
+'''
+import argparse
+import http.client
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from load_test import _free_port, start_server
+from query_corpus import CATEGORIES
+
+# The slowest corpus searches (typos, no bbox) leave the widest window for requests to overlap
+DEFAULT_QUERIES = CATEGORIES["typo"][:3] + CATEGORIES["exact"][:2]
+
+
+def _get(host: str, port: int, path: str) -> tuple[int, bytes]:
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    try:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def _json(host: str, port: int, path: str) -> dict:
+    status, body = _get(host, port, path)
+    if status != 200:
+        sys.exit(f"GET {path} returned {status}")
+    return json.loads(body)
+
+
+def _coalesced_metric(host: str, port: int) -> float:
+    _, body = _get(host, port, "/metrics")
+    for line in body.decode().splitlines():
+        if line.startswith("entrances_searches_coalesced_total "):
+            return float(line.split()[1])
+    return 0.0
+
+
+def burst(host: str, port: int, paths: list[str]) -> list[tuple[int, bytes]]:
+    """GET every path from its own thread and connection, all released at once."""
+    barrier = threading.Barrier(len(paths))
+
+    def one(path: str) -> tuple[int, bytes]:
+        connection = http.client.HTTPConnection(host, port, timeout=30)
+        try:
+            connection.connect()
+            barrier.wait()
+            connection.request("GET", path)
+            response = connection.getresponse()
+            return response.status, response.read()
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=len(paths)) as pool:
+        return list(pool.map(one, paths))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=16, help="identical requests sent at once")
+    parser.add_argument("--rounds", type=int, default=3, help="bursts per query")
+    parser.add_argument("--queries", nargs="+", default=DEFAULT_QUERIES, help="queries to burst")
+    parser.add_argument("--url", default=None, help="existing server to test (started with ENTRANCES_CACHE_SIZE=0)")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        host, port = "127.0.0.1", _free_port()
+        server = start_server(port, workers=1, cache=False)
+    failures = []
+    try:
+        before = _json(host, port, "/api/admin/cache")["singleFlight"]
+        metric_before = _coalesced_metric(host, port)
+        requests = 0
+        print(f"{'query':<28} {'requests':>9} {'computed':>9} {'coalesced':>10}")
+        for query in args.queries:
+            path = "/api/entrances?" + urlencode({"query": query})
+            start = _json(host, port, "/api/admin/cache")["singleFlight"]
+            responses = [r for _ in range(args.rounds) for r in burst(host, port, [path] * args.clients)]
+            end = _json(host, port, "/api/admin/cache")["singleFlight"]
+            status, expected = _get(host, port, path)
+            requests += len(responses)
+            if status != 200 or any(r != (200, expected) for r in responses):
+                failures.append(f"{query!r}: a coalesced response differs from a lone request's")
+            computed, coalesced = end["computed"] - start["computed"], end["coalesced"] - start["coalesced"]
+            print(f"{query:<28} {len(responses):>9} {computed:>9} {coalesced:>10}")
+            if computed + coalesced != len(responses):
+                failures.append(f"{query!r}: {computed} computed + {coalesced} coalesced != {len(responses)} requests")
+
+        # Same query, every request a different bbox: nothing may be shared
+        distinct = [
+            "/api/entrances?" + urlencode({"query": args.queries[0], "lat_min": -80 + i, "lat_max": 80, "lon_min": -180, "lon_max": 180})
+            for i in range(args.clients)
+        ]
+        start = _json(host, port, "/api/admin/cache")["singleFlight"]
+        if any(status != 200 for status, _ in burst(host, port, distinct)):
+            failures.append("distinct-bbox burst: non-200 response")
+        end = _json(host, port, "/api/admin/cache")["singleFlight"]
+        if end["coalesced"] != start["coalesced"]:
+            failures.append(f"distinct-bbox burst: {end['coalesced'] - start['coalesced']} requests were wrongly coalesced")
+
+        after = _json(host, port, "/api/admin/cache")["singleFlight"]
+        saved = after["coalesced"] - before["coalesced"]
+        metric_saved = _coalesced_metric(host, port) - metric_before
+        print(f"{requests} identical requests, {saved} searches saved ({saved / requests:.0%}); /metrics counted {metric_saved:g}")
+        if saved == 0:
+            failures.append("no search was coalesced")
+        if metric_saved != saved:
+            failures.append(f"/metrics counted {metric_saved:g} coalesced searches, /api/admin/cache {saved}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+'''
+Load test for /api/entrances against a local uvicorn server.
+
+Starts `uvicorn main:app` from backend/ on a free local port (or targets --url), then for
+each concurrency level runs that many virtual users for --duration seconds. Each user
+keeps one HTTP/1.1 keep-alive connection and sends requests back to back, drawn from the
+query corpus in scripts/query_corpus.py according to --mix, half of them (--bbox-share)
+with one of the corpus viewports. The client is plain asyncio streams, so nothing beyond
+the backend's own requirements is needed.
+
+Per level it reports throughput, latency p50/p95/p99/max, and the error rate (non-200
+responses, timeouts and connection errors). The saturation point is the last level whose
+throughput was at least --min-gain higher than the level before it, with an error rate
+under --max-error-rate, provided a higher level was tested and fell short; if throughput
+still rose at the highest level, the run reports it as not saturated. Past the saturation
+point, more concurrency only adds queueing: the sync endpoint runs in FastAPI's threadpool
+(40 threads by default) and the search holds the GIL for most of its time.
+
+The server's result cache is disabled unless --cache is given, so repeated corpus
+queries measure the search rather than cache hits.
+
+Example Usage:
+    python scripts/load_test.py
+    python scripts/load_test.py --concurrency 1 4 16 64 --duration 5 --workers 2
+    python scripts/load_test.py --mix exact=1,typo=1 --bbox-share 0 --output load.json
+    python scripts/load_test.py --url http://127.0.0.1:8000
+'''
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from query_corpus import BBOXES, CATEGORIES
+
+DEFAULT_MIX = "exact=4,typo=2,partial=2,no_match=1,accented=1"
+REQUEST_TIMEOUT = 30.0
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in CATEGORIES:
+            raise argparse.ArgumentTypeError(f"unknown query category {name!r} (choose from {', '.join(CATEGORIES)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def request_paths(mix: dict[str, float], bbox_share: float, count: int, seed: int) -> list[str]:
+    """A fixed, shuffled sequence of request paths for the given mix."""
+    rng = random.Random(seed)
+    categories = list(mix)
+    weights = [mix[c] for c in categories]
+    bboxes = list(BBOXES.values())
+    paths = []
+    for _ in range(count):
+        params = {"query": rng.choice(CATEGORIES[rng.choices(categories, weights)[0]])}
+        if rng.random() < bbox_share:
+            params.update(zip(("lat_min", "lat_max", "lon_min", "lon_max"), rng.choice(bboxes)))
+        paths.append("/api/entrances?" + urlencode(params))
+    return paths
+
+
+class Connection:
+    """Minimal HTTP/1.1 keep-alive client: GET only, Content-Length bodies only (what uvicorn sends here)."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+
+    async def get(self, path: str) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\nConnection: keep-alive\r\n\r\n".encode())
+        await self.writer.drain()
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split()[1])
+        headers = {k.strip().lower(): v.strip() for k, _, v in (line.partition(":") for line in lines[1:] if line)}
+        await self.reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+
+async def run_level(host: str, port: int, paths: list[str], concurrency: int, duration: float, warmup: float) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    measure_from = time.perf_counter() + warmup
+    stop_at = measure_from + duration
+
+    async def user(offset: int):
+        nonlocal errors
+        connection = Connection(host, port)
+        i = offset
+        while True:
+            started = time.perf_counter()
+            if started >= stop_at:
+                break
+            path = paths[i % len(paths)]
+            i += concurrency
+            try:
+                status = await asyncio.wait_for(connection.get(path), REQUEST_TIMEOUT)
+                ok = status == 200
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                ok = False
+                await connection.close()
+            if started >= measure_from:
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+        await connection.close()
+
+    await asyncio.gather(*(user(n) for n in range(concurrency)))
+    total = len(latencies) + errors
+    row = {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "errorRate": round(errors / total, 4) if total else 0.0,
+        "throughputPerSec": round(len(latencies) / duration, 1),
+    }
+    if latencies:
+        latencies.sort()
+        pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 3)
+        row.update(p50Ms=pick(0.50), p95Ms=pick(0.95), p99Ms=pick(0.99), maxMs=round(latencies[-1] * 1000, 3))
+    return row
+
+
+def saturation_point(rows: list[dict], min_gain: float, max_error_rate: float) -> tuple[dict | None, bool]:
+    """
+    (the last level that still raised throughput by min_gain over the previous one without
+    errors piling up, whether a later level showed it was the saturation point). False when
+    throughput was still rising at the highest level tested.
+    """
+    best = None
+    for row in rows:
+        if row["errorRate"] > max_error_rate:
+            return best, True
+        if best is not None and row["throughputPerSec"] < best["throughputPerSec"] * (1 + min_gain):
+            return best, True
+        best = row
+    return best, False
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int, cache: bool) -> subprocess.Popen:
+    env = dict(os.environ)
+    if not cache:
+        env["ENTRANCES_CACHE_SIZE"] = "0"
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--no-access-log", "--log-level", "warning",
+    ]
+    server = subprocess.Popen(command, cwd=ROOT / "backend", env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit(f"uvicorn exited with {server.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    sys.exit("uvicorn did not become healthy within 60 s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64], help="levels to run")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=1.0, help="unmeasured seconds at the start of each level")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"category weights (default {DEFAULT_MIX})")
+    parser.add_argument("--bbox-share", type=float, default=0.5, help="fraction of requests with a viewport bbox")
+    parser.add_argument("--seed", type=int, default=13, help="seed for the request sequence")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the local server")
+    parser.add_argument("--cache", action="store_true", help="keep the server's result cache on")
+    parser.add_argument("--min-gain", type=float, default=0.10, help="throughput gain below which a level counts as saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="error rate above which a level counts as saturated")
+    parser.add_argument("--url", default=None, help="test a running server instead of starting one")
+    parser.add_argument("--output", type=Path, default=None, help="write the per-level rows as JSON to this file")
+    args = parser.parse_args()
+
+    paths = request_paths(args.mix, args.bbox_share, 4096, args.seed)
+    server = None
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        host, port = "127.0.0.1", _free_port()
+        server = start_server(port, args.workers, args.cache)
+    try:
+        rows = []
+        print(f"{'users':>6} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7}")
+        for concurrency in args.concurrency:
+            row = asyncio.run(run_level(host, port, paths, concurrency, args.duration, args.warmup))
+            rows.append(row)
+            print(
+                f"{row['concurrency']:>6} {row['requests']:>9} {row['throughputPerSec']:>8.1f}"
+                f" {row.get('p50Ms', 0):>8.2f} {row.get('p95Ms', 0):>8.2f} {row.get('p99Ms', 0):>8.2f}"
+                f" {row.get('maxMs', 0):>8.2f} {row['errorRate']:>7.2%}"
+            )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    saturated, reached = saturation_point(rows, args.min_gain, args.max_error_rate)
+    if saturated is not None and reached:
+        print(
+            f"\nsaturation: {saturated['concurrency']} concurrent users at {saturated['throughputPerSec']:.1f} req/s"
+            f" (beyond it throughput rose by less than {args.min_gain:.0%} or errors exceeded {args.max_error_rate:.0%})"
+        )
+    elif saturated is not None:
+        print(
+            f"\nnot saturated up to {saturated['concurrency']} users: {saturated['throughputPerSec']:.1f} req/s,"
+            f" still at least {args.min_gain:.0%} more than the level before (test higher --concurrency)"
+        )
+    if args.output:
+        args.output.write_text(json.dumps({
+            "target": args.url or f"local uvicorn, {args.workers} worker(s), cache {'on' if args.cache else 'off'}",
+            "cpus": os.cpu_count(),
+            "durationSec": args.duration,
+            "mix": args.mix,
+            "bboxShare": args.bbox_share,
+            "levels": rows,
+            "saturation": saturated if reached else None,
+            "notSaturatedUpTo": None if reached or saturated is None else saturated["concurrency"],
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
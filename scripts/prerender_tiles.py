@@ -0,0 +1,57 @@
+'''
+Pre-render the low-zoom entrance vector tiles to disk.
+
+Low zoom tiles cover many entrances each and are requested by every map client, so they are
+the expensive ones to render on demand. This writes every non-empty tile of zoom 0 through
+--max-zoom to <out>/<store version>/<z>/<x>/<y>.mvt; point the backend at <out> with
+ENTRANCES_TILE_DIR and it serves those files instead of rendering them. Tiles of an older
+store version are left in place (and ignored); delete them when you like.
+
+Example Usage:
+    python scripts/prerender_tiles.py --out data/tiles
+    python scripts/prerender_tiles.py --out /var/cache/venue-finder/tiles --max-zoom 10
+'''
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from store import get_store
+from tiles import MAX_ZOOM, occupied_tiles, render_tile, tile_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", type=Path, required=True, help="tile directory (ENTRANCES_TILE_DIR of the backend)")
+    parser.add_argument("--max-zoom", type=int, default=8, help="highest zoom level to render (default: 8)")
+    args = parser.parse_args()
+    if not 0 <= args.max_zoom <= MAX_ZOOM:
+        sys.exit(f"--max-zoom must be between 0 and {MAX_ZOOM}")
+
+    store = get_store()
+    print(f"store version {store.version}: {len(store):,} entrances")
+    total_tiles = total_bytes = 0
+    for z in range(args.max_zoom + 1):
+        started = time.perf_counter()
+        tiles = zoom_bytes = 0
+        for x, y in occupied_tiles(store, z):
+            data = render_tile(store, z, x, y)
+            path = tile_path(args.out, store.version, z, x, y)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_bytes(data)
+            tmp.replace(path)
+            tiles += 1
+            zoom_bytes += len(data)
+        seconds = time.perf_counter() - started
+        print(f"  z{z:<2} {tiles:6,} tiles {zoom_bytes:12,} bytes in {seconds * 1000:8.1f} ms")
+        total_tiles += tiles
+        total_bytes += zoom_bytes
+    print(f"wrote {total_tiles:,} tiles ({total_bytes:,} bytes) to {args.out / store.version}")
+
+
+if __name__ == "__main__":
+    main()
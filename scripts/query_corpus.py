@@ -0,0 +1,55 @@
+'''
+Fixed station-search query corpus shared by the benchmark scripts.
+Mixes exact names, typos, partial names, non-matching queries and accented Paris names
+across all ten agencies, plus a few viewport bounding boxes (latMin, latMax, lonMin, lonMax).
+'''
+
+EXACT = [
+    "Union Station", "Metro Center", "Times Sq-42 St", "Ogilvie Transportation Center",
+    "Downtown Berkeley", "Back Bay", "State/Lake", "Oxford Circus Underground Station",
+    "Gare du Nord", "Abbesses", "Embarcadero", "Grand Central-42 St", "Harvard", "Pentagon",
+    "Pershing Square Station", "Balboa Park", "Clinton",
+]
+
+TYPOS = [
+    "Metro Centr", "Unoin Station", "Tims Sq", "Ogilvy Transportation", "Downtwn Berkely",
+    "Harvrd", "Embarcadro", "Farragut Nrth", "Kings Cros", "Gare de Lion",
+]
+
+PARTIAL = [
+    "Times", "Berkeley", "Oxford", "Central", "Park", "Lake", "Airport", "Washington",
+    "Square", "42 St", "Civic Center", "Howard",
+]
+
+# The station each typo means (scripts/calibrate_cutoff.py checks that it is still found)
+TYPO_TARGETS = {
+    "Metro Centr": "Metro Center", "Unoin Station": "Union Station", "Tims Sq": "Times Sq-42 St",
+    "Ogilvy Transportation": "Ogilvie Transportation Center", "Downtwn Berkely": "Downtown Berkeley",
+    "Harvrd": "Harvard", "Embarcadro": "Embarcadero", "Farragut Nrth": "Farragut North",
+    "Kings Cros": "King's Cross St. Pancras Underground Station", "Gare de Lion": "Gare de Lyon",
+}
+
+NO_MATCH = ["zzzzqqq", "xqjw", "qwertyuiop", "12345 67890"]
+
+ACCENTED = [
+    "Châtelet", "Chatelet", "République", "Republique", "Opéra", "Saint-Lazare",
+    "Gare de l'Est", "Hôtel de Ville", "Père Lachaise", "Bibliothèque François Mitterrand",
+]
+
+QUERIES = EXACT + TYPOS + PARTIAL + NO_MATCH + ACCENTED
+
+CATEGORIES = {
+    "exact": EXACT,
+    "typo": TYPOS,
+    "partial": PARTIAL,
+    "no_match": NO_MATCH,
+    "accented": ACCENTED,
+}
+
+BBOXES = {
+    "chicago_loop": (41.85, 41.92, -87.68, -87.60),
+    "paris_center": (48.84, 48.88, 2.31, 2.38),
+    "manhattan": (40.70, 40.80, -74.02, -73.93),
+    "sf_bay": (37.70, 37.90, -122.50, -122.20),
+    "london_zone1": (51.48, 51.54, -0.20, -0.05),
+}
@@ -0,0 +1,152 @@
+'''
+Per-worker memory of the API under uvicorn with 1, 4 and 16 workers, before and after
+sharing the entrance data.
+
+    private: `uvicorn main:app --workers N` with ENTRANCES_USE_SNAPSHOT=0, so every worker
+             parses the CSVs and builds its own arrays and indexes (the old behaviour)
+    shared:  `scripts/serve.py --workers N`, so every worker maps one snapshot built by the
+             parent in /dev/shm
+
+For each run, waits until every worker has loaded the store and its memory has settled,
+then reads from /proc, per worker:
+    RSS      resident pages, shared ones included
+    private  pages mapped by this worker alone (Private_Clean + Private_Dirty, the USS):
+             what each additional worker costs. The snapshot's arrays are shared, but the
+             interpreter and libraries, the string tables decoded from the snapshot and the
+             structures built at startup (exact-key lookup, typeahead, clusters, compact
+             payloads) are private to every worker
+    PSS      proportional set size: shared pages divided among the processes mapping them,
+             so the sum over workers is the real footprint
+Linux only.
+
+Example Usage:
+    python scripts/report_worker_rss.py
+    python scripts/report_worker_rss.py --workers 1 4 --json rss.json
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND = ROOT / "backend"
+
+
+def _children(pid: int) -> list[int]:
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            stat = Path(f"/proc/{entry}/stat").read_text()
+            cmdline = Path(f"/proc/{entry}/cmdline").read_bytes()
+        except OSError:
+            continue
+        # Field 4 is the parent pid; the command name (field 2) may contain spaces, so split after it
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid and b"resource_tracker" not in cmdline:
+            found.append(int(entry))
+    return sorted(found)
+
+
+def _memory_kb(pid: int) -> tuple[int, int, int]:
+    """(VmRSS, private, Pss) of pid in KiB."""
+    rss = private = pss = 0
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.startswith("VmRSS:"):
+            rss = int(line.split()[1])
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+        if line.startswith("Pss:"):
+            pss = int(line.split()[1])
+        elif line.startswith(("Private_Clean:", "Private_Dirty:")):
+            private += int(line.split()[1])
+    return rss, private, pss
+
+
+def _healthy(port: int) -> bool:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def measure(mode: str, workers: int, port: int, timeout: float) -> dict:
+    env = dict(os.environ, ENTRANCES_DATA_CHECK_SECONDS="-1")
+    if mode == "private":
+        env["ENTRANCES_USE_SNAPSHOT"] = "0"
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers)]
+    else:
+        command = [sys.executable, str(ROOT / "scripts" / "serve.py"), "--port", str(port), "--workers", str(workers)]
+    server = subprocess.Popen(command, cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + timeout
+        previous = None
+        stable = 0
+        while time.monotonic() < deadline:
+            time.sleep(0.5)
+            if server.poll() is not None:
+                raise RuntimeError(f"{mode} server exited with {server.returncode}")
+            # A single worker runs inside the uvicorn process itself
+            pids = [server.pid] if workers == 1 else _children(server.pid)
+            if len(pids) != workers or not _healthy(port):
+                continue
+            # Every worker loads the store in its lifespan before serving; wait until RSS stops moving
+            sample = [_memory_kb(pid) for pid in pids]
+            total = sum(rss for rss, _, _ in sample)
+            stable = stable + 1 if previous is not None and abs(total - previous) <= total * 0.002 else 0
+            previous = total
+            if stable >= 3:
+                break
+        else:
+            raise RuntimeError(f"{mode} server with {workers} workers did not settle in {timeout:.0f} s")
+        health = json.loads(urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2).read())
+        rss = [r for r, _, _ in sample]
+        private = [p for _, p, _ in sample]
+        pss = [p for _, _, p in sample]
+        return {
+            "mode": mode,
+            "workers": workers,
+            "loadedFrom": health["store"]["loadedFrom"],
+            "rssPerWorkerMiB": round(sum(rss) / len(rss) / 1024, 1),
+            "privatePerWorkerMiB": round(sum(private) / len(private) / 1024, 1),
+            "pssPerWorkerMiB": round(sum(pss) / len(pss) / 1024, 1),
+            "pssTotalMiB": round(sum(pss) / 1024, 1),
+        }
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16], help="worker counts to measure")
+    parser.add_argument("--port", type=int, default=8765, help="port for the servers under test")
+    parser.add_argument("--timeout", type=float, default=180, help="seconds to wait for a server to settle")
+    parser.add_argument("--json", type=Path, default=None, help="also write the rows to this file")
+    args = parser.parse_args()
+
+    rows = [measure(mode, n, args.port, args.timeout) for n in args.workers for mode in ("private", "shared")]
+
+    print(
+        f"{'mode':<8} {'workers':>7} {'loaded from':>11} {'RSS/worker MiB':>15} {'private/worker MiB':>19}"
+        f" {'PSS/worker MiB':>15} {'PSS total MiB':>14}"
+    )
+    for row in rows:
+        print(
+            f"{row['mode']:<8} {row['workers']:>7} {row['loadedFrom']:>11} {row['rssPerWorkerMiB']:>15.1f}"
+            f" {row['privatePerWorkerMiB']:>19.1f} {row['pssPerWorkerMiB']:>15.1f} {row['pssTotalMiB']:>14.1f}"
+        )
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
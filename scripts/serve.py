@@ -0,0 +1,59 @@
+'''
+Run the API with several uvicorn worker processes that share one copy of the entrance data.
+
+The parent compiles data/entrances/ into a snapshot once (scripts/build_snapshot.py, in a
+child process so the supervisor itself never loads pandas), places it in shared memory
+(/dev/shm when available) and points every worker at it through ENTRANCES_SNAPSHOT.
+Each worker then memory-maps the same file read-only instead of parsing the CSVs: the
+coordinate, id, R-tree and name index count arrays are views onto shared pages. The rest
+stays private to every worker: the station name, uniqueId and search key strings are
+decoded from the snapshot into Python lists, and the exact-key lookup, typeahead index,
+map clusters and compact payloads are built at startup (store.build_derived). So memory
+still grows with the worker count, by less per worker than without the snapshot;
+scripts/report_worker_rss.py reports the private memory of each worker.
+
+If the CSVs change while the server runs, each worker falls back to parsing them on its
+next reload; rerun this script (or scripts/build_snapshot.py with --output) to share again.
+
+Example Usage:
+    python scripts/serve.py --workers 4
+    python scripts/serve.py --workers 16 --port 8001 --snapshot /tmp/entrances.snap
+'''
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import uvicorn
+
+ROOT = Path(__file__).resolve().parent.parent
+SHM_DIR = Path("/dev/shm")
+
+
+def default_snapshot() -> Path:
+    if SHM_DIR.is_dir() and os.access(SHM_DIR, os.W_OK):
+        return SHM_DIR / "venue-finder-entrances.snap"
+    return ROOT / "data" / "entrances" / "entrances.snap"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="uvicorn worker processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--snapshot", type=Path, default=None, help="where to build the shared snapshot (default: /dev/shm)")
+    args = parser.parse_args()
+    snapshot = args.snapshot or default_snapshot()
+
+    subprocess.run(
+        [sys.executable, str(ROOT / "scripts" / "build_snapshot.py"), "--output", str(snapshot)],
+        check=True,
+    )
+    # Inherited by the spawned workers; store.py reads it at import
+    os.environ["ENTRANCES_SNAPSHOT"] = str(snapshot)
+    uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers, app_dir=str(ROOT / "backend"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+/**
+ * Loader for the compact entrance payloads built by scripts/build_payloads.py
+ * (public/data/compact/<agency>.vfe, also served by /api/agencies/{agency}/compact).
+ * Same result as loadTransitData() on the agency CSV, from about a third of the bytes
+ * and without parsing CSV text: a JSON header with the station name dictionary, then
+ * delta-encoded fixed-point Int32 coordinates and per-row name ids.
+ */
+import type { TransitEntrance } from "@/lib/transit-data";
+
+const MAGIC = "VFEC";
+const FORMAT = 1;
+
+interface CompactHeader {
+  format: number;
+  source: string;
+  count: number;
+  scale: number;
+  nameIdBytes: 2 | 4;
+  names: string[];
+}
+
+/** Decode one payload. sourceLabel replaces the agency name stored in it (e.g. "Metra" for "METRA"). */
+export function decodeCompactEntrances(buffer: ArrayBuffer, sourceLabel?: string): TransitEntrance[] {
+  const view = new DataView(buffer);
+  const magic = new TextDecoder().decode(new Uint8Array(buffer, 0, 4));
+  if (magic !== MAGIC) throw new Error("Not a compact entrance payload");
+  const headerLength = view.getUint32(4, true);
+  const header: CompactHeader = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+  if (header.format !== FORMAT) throw new Error(`Unsupported payload format ${header.format}`);
+
+  const n = header.count;
+  const offset = 8 + headerLength;
+  // The header is padded so these start 4-byte aligned; typed arrays are little-endian on every browser platform
+  const lat = new Int32Array(buffer, offset, n);
+  const lon = new Int32Array(buffer, offset + 4 * n, n);
+  const nameIds = header.nameIdBytes === 2
+    ? new Uint16Array(buffer, offset + 8 * n, n)
+    : new Uint32Array(buffer, offset + 8 * n, n);
+  const source = sourceLabel ?? header.source;
+
+  const out: TransitEntrance[] = new Array(n);
+  let fixedLat = 0;
+  let fixedLon = 0;
+  for (let i = 0; i < n; i++) {
+    fixedLat += lat[i];
+    fixedLon += lon[i];
+    out[i] = {
+      stationName: header.names[nameIds[i]],
+      source,
+      lat: fixedLat / header.scale,
+      lon: fixedLon / header.scale,
+    };
+  }
+  return out;
+}
+
+/**
+ * Fetch and decode /data/compact/<agency>.vfe.
+ * @param filename  agency data file, e.g. "cta.txt", "parismetro.txt"
+ * @param sourceLabel  e.g. "CTA", "BART", "PARIS METRO"
+ */
+export async function loadCompactData(filename: string, sourceLabel: string): Promise<TransitEntrance[]> {
+  const agency = filename.replace(/\.txt$/, "").toLowerCase();
+  const res = await fetch(`/data/compact/${agency}.vfe`);
+  if (!res.ok) throw new Error(`Failed to load ${agency}.vfe: ${res.status}`);
+  return decodeCompactEntrances(await res.arrayBuffer(), sourceLabel);
+}
@@ -17,17 +17,23 @@ export interface SearchEntrancesParams {
   lat_max?: number;
   lon_min?: number;
   lon_max?: number;
+  /** Rank stations across all agencies and return this many (default: up to 15 per agency) */
+  limit?: number;
+  /** Skip this many ranked stations (pagination with limit) */
+  offset?: number;
 }
 
 export async function searchTransitEntrances(
   params: SearchEntrancesParams
 ): Promise<TransitEntrance[]> {
-  const { query, lat_min, lat_max, lon_min, lon_max } = params;
+  const { query, lat_min, lat_max, lon_min, lon_max, limit, offset } = params;
   const sp = new URLSearchParams({ query: query.trim() });
   if (lat_min != null) sp.set("lat_min", String(lat_min));
   if (lat_max != null) sp.set("lat_max", String(lat_max));
   if (lon_min != null) sp.set("lon_min", String(lon_min));
   if (lon_max != null) sp.set("lon_max", String(lon_max));
+  if (limit != null) sp.set("limit", String(limit));
+  if (offset != null) sp.set("offset", String(offset));
   const res = await fetch(`${API_URL}/api/entrances?${sp.toString()}`);
   if (!res.ok) {
     const text = await res.text();
@@ -37,6 +43,31 @@ export async function searchTransitEntrances(
   return data.entrances ?? [];
 }
 
+export interface NearestEntrance extends TransitEntrance {
+  distanceMeters: number;
+}
+
+export interface NearestEntrancesParams {
+  lat: number;
+  lon: number;
+  k?: number;
+  max_meters?: number;
+}
+
+/** Fetch the k entrances nearest to a coordinate (all agencies), nearest first. */
+export async function fetchNearestEntrances(params: NearestEntrancesParams): Promise<NearestEntrance[]> {
+  const sp = new URLSearchParams({ lat: String(params.lat), lon: String(params.lon) });
+  if (params.k != null) sp.set("k", String(params.k));
+  if (params.max_meters != null) sp.set("max_meters", String(params.max_meters));
+  const res = await fetch(`${API_URL}/api/entrances/nearest?${sp.toString()}`);
+  if (!res.ok) {
+    const text = await res.text();
+    throw new Error(text || `Nearest entrances API error: ${res.status}`);
+  }
+  const data = await res.json();
+  return data.entrances ?? [];
+}
+
 export interface CtaEntrancesParams {
   lat_min?: number;
   lat_max?: number;
@@ -61,3 +92,47 @@ export async function fetchCtaEntrances(params?: CtaEntrancesParams): Promise<Tr
   const data = await res.json();
   return data.entrances ?? [];
 }
+
+export interface EntranceCluster {
+  lat: number;
+  lon: number;
+  count: number;
+  /** Entrances per agency source, e.g. { MTA: 12, PARISMETRO: 3 } */
+  agencies: Record<string, number>;
+}
+
+export interface EntranceClusters {
+  zoom: number;
+  clusters: EntranceCluster[];
+  /** Entrances drawn individually: single-entrance cells, or everything above zoom 16 */
+  entrances: TransitEntrance[];
+  /** True if the viewport held more than `limit` features and only the largest were returned */
+  truncated: boolean;
+}
+
+export interface EntranceClustersParams {
+  zoom: number;
+  lat_min: number;
+  lat_max: number;
+  lon_min: number;
+  lon_max: number;
+  limit?: number;
+}
+
+/** Fetch server-side clusters for a map viewport, instead of loading and drawing every entrance. */
+export async function fetchEntranceClusters(params: EntranceClustersParams): Promise<EntranceClusters> {
+  const sp = new URLSearchParams({
+    zoom: String(params.zoom),
+    lat_min: String(params.lat_min),
+    lat_max: String(params.lat_max),
+    lon_min: String(params.lon_min),
+    lon_max: String(params.lon_max),
+  });
+  if (params.limit != null) sp.set("limit", String(params.limit));
+  const res = await fetch(`${API_URL}/api/entrances/clusters?${sp.toString()}`);
+  if (!res.ok) {
+    const text = await res.text();
+    throw new Error(text || `Entrance clusters API error: ${res.status}`);
+  }
+  return res.json();
+}
@@ -5,7 +5,8 @@ import VenueMap from "@/components/VenueMap";
 import VenueCard from "@/components/VenueCard";
 import EntranceDetail from "@/components/EntranceDetail";
 import { MOCK_VENUES, type EntranceMarker } from "@/data/venues";
-import { type TransitEntrance, loadTransitData } from "@/lib/transit-data";
+import type { TransitEntrance } from "@/lib/transit-data";
+import { loadCompactData } from "@/lib/compact-data";
 import { ScanLine, Target, Layers, Train, Loader2, MapPin } from "lucide-react";
 
 const Index = () => {
@@ -34,14 +35,14 @@ const Index = () => {
     setCityLoading(true);
     setCityError(null);
     try {
-      const entrances = await loadTransitData(activeVenue.dataFile, activeVenue.sourceLabel);
+      const entrances = await loadCompactData(activeVenue.dataFile, activeVenue.sourceLabel);
       setCityEntrances(entrances);
 
       // Load extra data files (e.g. Metra for Chicago)
       if (activeVenue.extraDataFiles) {
         const extras = await Promise.all(
           activeVenue.extraDataFiles.map(async (extra) => {
-            const data = await loadTransitData(extra.file, extra.label);
+            const data = await loadCompactData(extra.file, extra.label);
             return { entrances: data, color: extra.color, label: extra.label };
           })
         );